@@ -0,0 +1,130 @@
+import json
+from adafruit_servokit import ServoKit
+from adafruit_bus_device.i2c_device import I2CDevice
+import board
+import busio
+import RPi.GPIO as GPIO  # Importar la librería GPIO para los pines de la Raspberry Pi
+from backends.servo_backend import ServoBackend
+
+# Registros del PCA9685
+PCA9685_ADDRESS = 0x40
+MODE1 = 0x00
+MODE1_AUTO_INCREMENT = 0x20
+LED0_ON_L = 0x06
+PRESCALE = 0xFE
+PCA9685_CLOCK = 25000000
+
+# Canal de PWM por hardware de cada pin BCM (12/18 comparten PWM0, 13/19 comparten PWM1)
+HARDWARE_PWM_CHANNELS = {12: 0, 18: 0, 13: 1, 19: 1}
+
+class GpioServoChannel:
+    def __init__(self, pin, frequency=50):
+        # El objeto PWM se crea una sola vez y vive mientras dure el canal
+        self.pin = pin
+        GPIO.setup(pin, GPIO.OUT)
+        self.pwm = GPIO.PWM(pin, frequency)
+        self.pwm.start(0)
+        self.dutyCycle = 0
+
+    def setDutyCycle(self, dutyCycle):
+        if dutyCycle == self.dutyCycle:
+            return False
+        self.pwm.ChangeDutyCycle(dutyCycle)
+        self.dutyCycle = dutyCycle
+        return True
+
+    def close(self):
+        self.pwm.stop()
+
+class HardwarePwmServoChannel:
+    def __init__(self, pi, pin, frequency=50):
+        # PWM temporizado por hardware mediante el daemon pigpio (sin jitter de software)
+        self.pi = pi
+        self.pin = pin
+        self.frequency = frequency
+        self.dutyCycle = 0
+        self.pi.hardware_PWM(pin, frequency, 0)
+
+    def setDutyCycle(self, dutyCycle):
+        if dutyCycle == self.dutyCycle:
+            return False
+        # pigpio expresa el ciclo de trabajo en millonésimas
+        self.pi.hardware_PWM(self.pin, self.frequency, int(dutyCycle * 10000))
+        self.dutyCycle = dutyCycle
+        return True
+
+    def close(self):
+        self.pi.hardware_PWM(self.pin, 0, 0)
+
+class HardwareServoBackend(ServoBackend):
+    def __init__(self, section):
+        hardwarePwmPins = json.loads(section.get('hardware_pwm_pins', '[]'))
+
+        # Configuración del bus I2C
+        self.i2c_bus = busio.I2C(board.SCL, board.SDA)
+
+        # Inicializar el PCA9685
+        self.kit = ServoKit(channels=16, i2c=self.i2c_bus)
+
+        # Acceso directo a los registros para escribir frames completos en una sola transacción
+        self.pca = I2CDevice(self.i2c_bus, PCA9685_ADDRESS)
+        mode1 = self.readRegister(MODE1)
+        self.writeRegister(MODE1, mode1 | MODE1_AUTO_INCREMENT)
+        self.pwmFrequency = PCA9685_CLOCK / 4096 / (self.readRegister(PRESCALE) + 1)
+
+        # Inicializar servos controlados por pines de la Raspberry Pi
+        self.rpi_servos = [12, 13, 18]  # Pines GPIO utilizados
+        self.numGpioChannels = len(self.rpi_servos)
+        GPIO.setmode(GPIO.BCM)
+        self.pi = None
+        self.gpioChannels = []
+        usedHardwareChannels = {}
+        for pin in self.rpi_servos:
+            if pin in hardwarePwmPins:
+                if pin not in HARDWARE_PWM_CHANNELS:
+                    raise ValueError(f"GPIO {pin} has no hardware PWM channel")
+                pwmChannel = HARDWARE_PWM_CHANNELS[pin]
+                if pwmChannel in usedHardwareChannels:
+                    raise ValueError(f"GPIO {pin} and GPIO {usedHardwareChannels[pwmChannel]} share hardware PWM channel {pwmChannel}")
+                usedHardwareChannels[pwmChannel] = pin
+                self.gpioChannels.append(HardwarePwmServoChannel(self.connectPigpio(), pin))
+            else:
+                self.gpioChannels.append(GpioServoChannel(pin))  # Iniciar PWM a 50Hz
+
+    def connectPigpio(self):
+        if self.pi is None:
+            import pigpio  # Dependencia opcional, solo necesaria para PWM por hardware
+            self.pi = pigpio.pi()
+            if not self.pi.connected:
+                raise RuntimeError("pigpio daemon is not running")
+        return self.pi
+
+    def readRegister(self, register):
+        result = bytearray(1)
+        with self.pca as device:
+            device.write_then_readinto(bytes([register]), result)
+        return result[0]
+
+    def writeRegister(self, register, value):
+        with self.pca as device:
+            device.write(bytes([register, value]))
+
+    def writePwmCounts(self, firstChannel, counts):
+        # Una sola ráfaga con auto-incremento desde LEDn_ON_L del primer canal
+        buffer = bytearray(1 + 4 * len(counts))
+        buffer[0] = LED0_ON_L + 4 * firstChannel
+        for offset, count in enumerate(counts):
+            buffer[3 + 4 * offset] = count & 0xFF
+            buffer[4 + 4 * offset] = count >> 8
+        with self.pca as device:
+            device.write(buffer)
+
+    def writeDutyCycle(self, gpioIndex, dutyCycle):
+        self.gpioChannels[gpioIndex].setDutyCycle(dutyCycle)
+
+    def close(self):
+        for channel in self.gpioChannels:
+            channel.close()
+        if self.pi is not None:
+            self.pi.stop()
+        GPIO.cleanup(self.rpi_servos)
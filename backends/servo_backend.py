@@ -0,0 +1,31 @@
+# Prescaler que programa ServoKit para 50 Hz con el reloj interno de 25 MHz
+PCA9685_PRESCALE_50HZ = 121
+
+class ServoBackend:
+    # Interfaz común de los drivers de salida de servos.
+    # Canales 0-15: PCA9685 (cuentas de 12 bits); canales GPIO: ciclo de trabajo en %.
+    pwmFrequency = 50.0
+    numPwmChannels = 16
+    numGpioChannels = 3
+
+    def writePwmCounts(self, firstChannel, counts):
+        # Escribe cuentas OFF consecutivas desde firstChannel en una sola transacción
+        raise NotImplementedError
+
+    def writeDutyCycle(self, gpioIndex, dutyCycle):
+        raise NotImplementedError
+
+    def close(self):
+        pass
+
+def createServoBackend(config):
+    section = config['ServoMotor'] if 'ServoMotor' in config else {}
+    backend = section.get('backend', 'hardware')
+    # Importación diferida: el backend hardware requiere las librerías de la Raspberry Pi
+    if backend == 'hardware':
+        from backends.hardware_servo_backend import HardwareServoBackend
+        return HardwareServoBackend(section)
+    elif backend == 'simulated':
+        from backends.simulated_servo_backend import SimulatedServoBackend
+        return SimulatedServoBackend(section)
+    raise ValueError(f"Unknown servo backend: {backend}")
@@ -0,0 +1,74 @@
+import time
+from array import array
+from backends.servo_backend import ServoBackend, PCA9685_PRESCALE_50HZ
+
+class SimulatedServoBackend(ServoBackend):
+    def __init__(self, section):
+        # Misma frecuencia efectiva que el PCA9685 real con prescaler 121
+        self.pwmFrequency = 25000000 / 4096 / (PCA9685_PRESCALE_50HZ + 1)
+        self.i2cFrequency = int(section.get('simulated_i2c_frequency', '400000'))
+        self.modelLatency = section.get('simulated_model_latency', 'true').lower() == 'true'
+
+        # Buffer circular preasignado: no se reserva memoria en el camino de escritura
+        self.capacity = int(section.get('simulated_trace_capacity', '65536'))
+        self.timestamps = array('q', bytes(8 * self.capacity))
+        self.channels = array('b', bytes(self.capacity))
+        self.values = array('d', bytes(8 * self.capacity))
+        self.head = 0
+        self.totalWrites = 0
+        self.transactions = 0
+        self.busTime = 0.0
+
+    def i2cTransactionTime(self, numBytes):
+        # Dirección + registro + datos, 9 bits por byte (ACK) más condiciones START/STOP
+        return ((numBytes + 2) * 9 + 2) / self.i2cFrequency
+
+    def record(self, timestamp, channel, value):
+        slot = self.head
+        self.timestamps[slot] = timestamp
+        self.channels[slot] = channel
+        self.values[slot] = value
+        self.head = (slot + 1) % self.capacity
+        self.totalWrites += 1
+
+    def writePwmCounts(self, firstChannel, counts):
+        latency = self.i2cTransactionTime(4 * len(counts))
+        if self.modelLatency:
+            time.sleep(latency)
+        self.busTime += latency
+        self.transactions += 1
+        timestamp = time.monotonic_ns()
+        for offset, count in enumerate(counts):
+            self.record(timestamp, firstChannel + offset, count)
+
+    def writeDutyCycle(self, gpioIndex, dutyCycle):
+        self.record(time.monotonic_ns(), self.numPwmChannels + gpioIndex, dutyCycle)
+
+    def getTrace(self):
+        # Devuelve las escrituras retenidas en orden cronológico: (timestamp_ns, canal, valor)
+        size = min(self.totalWrites, self.capacity)
+        start = (self.head - size) % self.capacity
+        trace = []
+        for i in range(size):
+            slot = (start + i) % self.capacity
+            trace.append((self.timestamps[slot], self.channels[slot], self.values[slot]))
+        return trace
+
+    def getStats(self):
+        trace = self.getTrace()
+        # Intervalos entre transacciones I2C consecutivas (un instante por frame)
+        instants = sorted({timestamp for timestamp, channel, _ in trace if channel < self.numPwmChannels})
+        intervals = [(b - a) / 1e6 for a, b in zip(instants, instants[1:])]
+        stats = {
+            "total_writes": self.totalWrites,
+            "dropped_writes": max(0, self.totalWrites - self.capacity),
+            "i2c_transactions": self.transactions,
+            "i2c_bus_time_s": self.busTime,
+        }
+        if intervals:
+            mean = sum(intervals) / len(intervals)
+            stats["interval_mean_ms"] = mean
+            stats["interval_min_ms"] = min(intervals)
+            stats["interval_max_ms"] = max(intervals)
+            stats["interval_jitter_ms"] = (sum((x - mean) ** 2 for x in intervals) / len(intervals)) ** 0.5
+        return stats
@@ -1,21 +1,187 @@
+import json
 import sqlite3
+from models import NUM_SERVOS, ANGLE_UNSET
+from contextlib import contextmanager
+
+# Ajustes de rendimiento para una tarjeta SD: WAL evita reescribir el journal en cada commit y
+# synchronous=NORMAL solo sincroniza en los checkpoints (sigue siendo seguro ante cortes con WAL)
+CONNECTION_PRAGMAS = (
+    'PRAGMA journal_mode = WAL',
+    'PRAGMA synchronous = NORMAL',
+    'PRAGMA cache_size = -8000',  # 8 MB
+    'PRAGMA temp_store = MEMORY',
+    'PRAGMA busy_timeout = 5000',
+)
+STATEMENT_CACHE_SIZE = 256
+
+def migrateBaseTables(conn):
+    conn.execute('''CREATE TABLE IF NOT EXISTS movements (
+                        id INTEGER PRIMARY KEY AUTOINCREMENT,
+                        name TEXT NOT NULL UNIQUE
+                    )''')
+    conn.execute('''CREATE TABLE IF NOT EXISTS positions (
+                        id INTEGER PRIMARY KEY AUTOINCREMENT,
+                        "order" INTEGER,
+                        time INTEGER,
+                        angles TEXT NOT NULL,
+                        movement_id INTEGER,
+                        FOREIGN KEY (movement_id) REFERENCES movements(id)
+                    )''')
+
+def migrateProfileColumn(conn):
+    # Bases de datos creadas antes de los perfiles de movimiento
+    columns = [row[1] for row in conn.execute('PRAGMA table_info(positions)')]
+    if 'profile' not in columns:
+        conn.execute("ALTER TABLE positions ADD COLUMN profile TEXT NOT NULL DEFAULT 'linear'")
+
+def migratePositionsConstraints(conn):
+    # SQLite no permite añadir restricciones con ALTER TABLE: se reconstruye la tabla.
+    # Las posiciones huérfanas (sin movimiento existente) no se copian.
+    orphans = conn.execute('SELECT COUNT(*) FROM positions WHERE movement_id IS NULL OR movement_id NOT IN (SELECT id FROM movements)').fetchone()[0]
+    if orphans:
+        print(f"Migración: se descartan {orphans} posiciones sin movimiento existente")
+    # Restos de una migración interrumpida con versiones anteriores de migrate()
+    conn.execute('DROP TABLE IF EXISTS positions_new')
+    conn.execute('''CREATE TABLE positions_new (
+                        id INTEGER PRIMARY KEY AUTOINCREMENT,
+                        "order" INTEGER NOT NULL,
+                        time INTEGER NOT NULL CHECK (time >= 0),
+                        angles TEXT NOT NULL,
+                        movement_id INTEGER NOT NULL REFERENCES movements(id) ON DELETE CASCADE,
+                        profile TEXT NOT NULL DEFAULT 'linear'
+                    )''')
+    conn.execute('''INSERT INTO positions_new (id, "order", time, angles, movement_id, profile)
+                    SELECT id, COALESCE("order", 0), COALESCE(time, 0), angles, movement_id, profile
+                    FROM positions WHERE movement_id IN (SELECT id FROM movements)''')
+    conn.execute('DROP TABLE positions')
+    conn.execute('ALTER TABLE positions_new RENAME TO positions')
+    # Todas las consultas de posiciones filtran por movimiento y ordenan/filtran por "order".
+    # No es UNIQUE porque los intercambios de orden pasan por estados intermedios con duplicados.
+    conn.execute('CREATE INDEX IF NOT EXISTS idx_positions_movement_order ON positions (movement_id, "order")')
+
+def packAnglesJson(anglesJson):
+    # Conversión tolerante de filas antiguas: se descartan ids o ángulos fuera de rango
+    frame = bytearray([ANGLE_UNSET]) * NUM_SERVOS
+    try:
+        angles = json.loads(anglesJson)
+    except (TypeError, ValueError):
+        angles = []
+    for angle in angles if isinstance(angles, list) else []:
+        if not isinstance(angle, dict):
+            continue
+        servoId, value = angle.get('id'), angle.get('angle')
+        if isinstance(servoId, int) and 1 <= servoId <= NUM_SERVOS and isinstance(value, (int, float)) and 0 <= value <= 180:
+            frame[servoId - 1] = round(value)
+    return bytes(frame)
+
+def migratePackedAngles(conn):
+    # angles pasa de JSON [{"id", "angle"}, ...] a un BLOB de NUM_SERVOS bytes (formato de models.packAngles)
+    conn.create_function('pack_angles_json', 1, packAnglesJson, deterministic=True)
+    conn.execute('DROP TABLE IF EXISTS positions_new')
+    conn.execute(f'''CREATE TABLE positions_new (
+                        id INTEGER PRIMARY KEY AUTOINCREMENT,
+                        "order" INTEGER NOT NULL,
+                        time INTEGER NOT NULL CHECK (time >= 0),
+                        angles BLOB NOT NULL CHECK (length(angles) = {NUM_SERVOS}),
+                        movement_id INTEGER NOT NULL REFERENCES movements(id) ON DELETE CASCADE,
+                        profile TEXT NOT NULL DEFAULT 'linear'
+                    )''')
+    conn.execute('''INSERT INTO positions_new (id, "order", time, angles, movement_id, profile)
+                    SELECT id, "order", time, pack_angles_json(angles), movement_id, profile FROM positions''')
+    conn.execute('DROP TABLE positions')
+    conn.execute('ALTER TABLE positions_new RENAME TO positions')
+    conn.execute('CREATE INDEX IF NOT EXISTS idx_positions_movement_order ON positions (movement_id, "order")')
+
+# Cada migración se aplica una sola vez; la versión actual se guarda en PRAGMA user_version
+MIGRATIONS = [
+    (1, migrateBaseTables),
+    (2, migrateProfileColumn),
+    (3, migratePositionsConstraints),
+    (4, migratePackedAngles),
+]
 
 class Database:
     def __init__(self, dbName="robot.db"):
-        self.conn = sqlite3.connect(dbName)
-        self.createTables()
-
-    def createTables(self):
-        with self.conn:
-            self.conn.execute('''CREATE TABLE IF NOT EXISTS movements (
-                                    id INTEGER PRIMARY KEY AUTOINCREMENT,
-                                    name TEXT NOT NULL UNIQUE
-                                )''')
-            self.conn.execute('''CREATE TABLE IF NOT EXISTS positions (
-                                    id INTEGER PRIMARY KEY AUTOINCREMENT,
-                                    "order" INTEGER,
-                                    time INTEGER,
-                                    angles TEXT NOT NULL,
-                                    movement_id INTEGER,
-                                    FOREIGN KEY (movement_id) REFERENCES movements(id)
-                                )''')
+        # La conexión se crea aquí pero, una vez arrancado DatabaseWorker, solo la usa su hilo
+        self.conn = sqlite3.connect(dbName, cached_statements=STATEMENT_CACHE_SIZE, check_same_thread=False)
+        self.transactionDepth = 0
+        self.atomicDepth = 0
+        self.groupCommit = False
+        self.commitPending = False
+        for pragma in CONNECTION_PRAGMAS:
+            self.conn.execute(pragma)
+        self.migrate()
+        self.conn.execute('PRAGMA foreign_keys = ON')
+
+    def commit(self):
+        # Dentro de una transacción explícita el commit se difiere hasta el final;
+        # en modo group commit lo hace DatabaseWorker al cerrar el grupo
+        if self.transactionDepth > 0 or self.atomicDepth > 0:
+            return
+        if self.groupCommit:
+            self.commitPending = True
+        else:
+            self.conn.commit()
+
+    def flush(self):
+        if self.commitPending and self.transactionDepth == 0:
+            self.commitPending = False
+            self.conn.commit()
+
+    def beginTransaction(self):
+        if self.transactionDepth == 0:
+            self.commitPending = False
+            self.conn.commit()
+        self.transactionDepth += 1
+
+    def endTransaction(self, success):
+        self.transactionDepth -= 1
+        if self.transactionDepth > 0:
+            return
+        if success:
+            self.conn.commit()
+        else:
+            self.conn.rollback()
+
+    @contextmanager
+    def atomic(self):
+        # Varias sentencias que se aplican todas o ninguna; al salir se confirman con commit()
+        # (en modo group commit, junto con el resto del grupo)
+        began = not self.conn.in_transaction
+        if began:
+            self.conn.execute('BEGIN')
+        changes = self.conn.total_changes
+        self.conn.execute('SAVEPOINT atomic')
+        self.atomicDepth += 1
+        try:
+            yield
+        except BaseException:
+            self.atomicDepth -= 1
+            self.conn.execute('ROLLBACK TO atomic')
+            self.conn.execute('RELEASE atomic')
+            if began:
+                self.conn.rollback()
+            raise
+        self.atomicDepth -= 1
+        self.conn.execute('RELEASE atomic')
+        if self.conn.total_changes != changes:
+            self.commit()
+        elif began:
+            self.conn.commit()  # Solo lecturas: no dejar la transacción abierta
+
+    def getSchemaVersion(self):
+        return self.conn.execute('PRAGMA user_version').fetchone()[0]
+
+    def migrate(self):
+        # Las migraciones se ejecutan con las claves foráneas desactivadas (necesario para reconstruir tablas)
+        self.conn.execute('PRAGMA foreign_keys = OFF')
+        for version, migration in MIGRATIONS:
+            if version <= self.getSchemaVersion():
+                continue
+            with self.conn:
+                # BEGIN explícito: sqlite3 no abre transacción antes de un CREATE/DROP, y una migración
+                # interrumpida debe deshacerse entera, DDL incluido
+                self.conn.execute('BEGIN')
+                migration(self.conn)
+                self.conn.execute(f'PRAGMA user_version = {version}')
+            print(f"Base de datos migrada a la versión {version}")
@@ -0,0 +1,154 @@
+import asyncio
+import configparser
+import contextvars
+import queue
+import threading
+import time
+from contextlib import asynccontextmanager
+from metrics import registry
+
+SHUTDOWN = object()
+
+# Worker dueño de la transacción en curso (si la tarea actual está dentro de una)
+currentTransaction = contextvars.ContextVar('currentTransaction', default=None)
+
+class DatabaseWorker:
+    # Hilo único que ejecuta todo el acceso a SQLite fuera del bucle de eventos.
+    # Los trabajos se atienden en orden FIFO, así que cada conexión WebSocket (que espera
+    # cada petición antes de la siguiente) conserva su orden. Las escrituras de un mismo
+    # intervalo se confirman con un único commit (group commit) antes de responder.
+    def __init__(self, db, configFile='config.ini'):
+        config = configparser.ConfigParser()
+        config.read(configFile)
+        section = config['Database'] if 'Database' in config else {}
+        self.commitWindow = float(section.get('commit_window_ms', '5')) / 1000.0
+        self.maxGroupSize = int(section.get('max_group_size', '64'))
+
+        self.db = db
+        self.jobs = queue.Queue()
+        self.thread = None
+        self.transactionLock = asyncio.Lock()
+        self.rollbackListeners = []
+
+        self.queueWait = registry.histogram('db.queue_wait')
+        self.commitLatency = registry.histogram('db.commit_latency')
+        registry.gauge('db.queue_depth', self.jobs.qsize)
+
+    def start(self):
+        self.db.groupCommit = True
+        self.thread = threading.Thread(target=self.workerLoop, name='DatabaseWorker', daemon=True)
+        self.thread.start()
+
+    def stop(self):
+        if self.thread is None:
+            return
+        self.jobs.put(SHUTDOWN)
+        self.thread.join()
+        self.thread = None
+        self.db.groupCommit = False
+        self.db.flush()
+
+    def addRollbackListener(self, listener):
+        # Se avisa en el bucle de eventos cuando transaction() deshace sus cambios
+        self.rollbackListeners.append(listener)
+
+    async def waitForTransaction(self):
+        # Fuera de la transacción en curso hay que esperar a que termine (commit o rollback)
+        if self.transactionLock.locked() and currentTransaction.get() is not self:
+            async with self.transactionLock:
+                pass
+
+    async def run(self, function, *args):
+        await self.waitForTransaction()
+        if self.thread is None:
+            return function(*args)
+        loop = asyncio.get_running_loop()
+        future = loop.create_future()
+        self.jobs.put((function, args, loop, future, time.perf_counter()))
+        return await future
+
+    @asynccontextmanager
+    async def transaction(self):
+        # Transacción exclusiva que abarca varios await (peticiones /app/batch)
+        if currentTransaction.get() is self:
+            yield
+            return
+        async with self.transactionLock:
+            token = currentTransaction.set(self)
+            try:
+                await self.run(self.db.beginTransaction)
+                try:
+                    yield
+                except BaseException:
+                    await self.run(self.db.endTransaction, False)
+                    for listener in self.rollbackListeners:
+                        listener()
+                    raise
+                await self.run(self.db.endTransaction, True)
+            finally:
+                currentTransaction.reset(token)
+
+    def workerLoop(self):
+        while True:
+            job = self.jobs.get()
+            if job is SHUTDOWN:
+                return
+            deferred = []
+            deadline = time.perf_counter() + self.commitWindow
+            while job is not None:
+                outcome = self.execute(job)
+                if self.db.commitPending:
+                    # Escritura (o lectura posterior a una): se responde tras el commit del grupo
+                    deferred.append(outcome)
+                else:
+                    self.resolve(*outcome)
+                job = self.nextGroupJob(deadline, len(deferred))
+                if job is SHUTDOWN:
+                    self.jobs.put(SHUTDOWN)
+                    job = None
+            self.commitGroup(deferred)
+
+    def nextGroupJob(self, deadline, groupSize):
+        # Sin escrituras pendientes no hay grupo que alargar
+        if not self.db.commitPending or groupSize >= self.maxGroupSize:
+            return None
+        remaining = deadline - time.perf_counter()
+        try:
+            if remaining > 0:
+                return self.jobs.get(timeout=remaining)
+            return self.jobs.get_nowait()
+        except queue.Empty:
+            return None
+
+    def execute(self, job):
+        function, args, loop, future, queuedAt = job
+        self.queueWait.record(time.perf_counter() - queuedAt)
+        try:
+            return loop, future, function(*args), None
+        except Exception as e:
+            return loop, future, None, e
+
+    def commitGroup(self, deferred):
+        if self.db.commitPending:
+            startTime = time.perf_counter()
+            try:
+                self.db.flush()
+            except Exception as e:
+                self.db.conn.rollback()
+                deferred = [(loop, future, None, e) for loop, future, _, _ in deferred]
+            self.commitLatency.record(time.perf_counter() - startTime)
+            registry.increment('db.group_commits')
+            registry.increment('db.grouped_jobs', len(deferred))
+        for outcome in deferred:
+            self.resolve(*outcome)
+
+    def resolve(self, loop, future, result, error):
+        loop.call_soon_threadsafe(setFutureOutcome, future, result, error)
+
+def setFutureOutcome(future, result, error):
+    if future.done():  # Petición cancelada mientras esperaba
+        return
+    if error is not None:
+        future.set_exception(error)
+    else:
+        future.set_result(result)
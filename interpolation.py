@@ -0,0 +1,69 @@
+import numpy as np
+
+# Perfiles de movimiento: mapean el progreso temporal t en [0, 1] al progreso de posición s en [0, 1]
+LINEAR = 'linear'
+CUBIC = 'cubic'
+MINIMUM_JERK = 'minimum_jerk'
+TRAPEZOIDAL = 'trapezoidal'
+SPLINE = 'spline'  # Curva continua en velocidad a través de los keyframes spline consecutivos
+PROFILES = (LINEAR, CUBIC, MINIMUM_JERK, TRAPEZOIDAL, SPLINE)
+
+# Fracción del segmento dedicada a acelerar (y a frenar) en el perfil trapezoidal
+TRAPEZOIDAL_RAMP = 1 / 3
+
+def ease(profile, t):
+    t = np.clip(t, 0.0, 1.0)
+    if profile == LINEAR:
+        return t
+    if profile in (CUBIC, SPLINE):
+        # Un segmento spline aislado (pendientes nulas en ambos extremos) es la cúbica
+        return t * t * (3 - 2 * t)
+    if profile == MINIMUM_JERK:
+        return t * t * t * (10 + t * (6 * t - 15))
+    if profile == TRAPEZOIDAL:
+        ramp = TRAPEZOIDAL_RAMP
+        peakVelocity = 1 / (1 - ramp)
+        return np.where(
+            t < ramp, peakVelocity * t * t / (2 * ramp),
+            np.where(t > 1 - ramp, 1 - peakVelocity * (1 - t) ** 2 / (2 * ramp),
+                     peakVelocity * (t - ramp / 2)))
+    raise ValueError(f"Unknown motion profile: {profile}")
+
+def interpolateSegment(start, end, ticks, profile=LINEAR):
+    # Todos los ticks de un segmento (ticks x servos) en una sola operación vectorial
+    progress = ease(profile, np.arange(1, ticks + 1) / ticks)
+    start = np.asarray(start, dtype=float)
+    return start + (np.asarray(end, dtype=float) - start) * progress[:, None]
+
+def interpolateFrame(start, end, t, profile=LINEAR):
+    # Un único frame (servos,) para el progreso temporal t
+    start = np.asarray(start, dtype=float)
+    return start + (np.asarray(end, dtype=float) - start) * ease(profile, t)
+
+def splineSlopes(values, ticks, blended):
+    # Pendientes (grados por tick) en cada keyframe de una curva de Hermite monótona (Fritsch-Carlson).
+    # values: (keyframes + 1, servos) con el punto de partida en la fila 0 (NaN = desconocido);
+    # ticks: duración de cada segmento; blended: segmentos con perfil spline.
+    # Solo se mezcla en un keyframe entre dos segmentos spline; en el resto la pendiente es 0.
+    values = np.asarray(values, dtype=float)
+    ticks = np.asarray(ticks, dtype=float)
+    slopes = np.zeros_like(values)
+    if len(ticks) < 2:
+        return slopes
+    secants = np.diff(values, axis=0) / ticks[:, None]
+    before, after = secants[:-1], secants[1:]
+    hBefore, hAfter = ticks[:-1, None], ticks[1:, None]
+    # Media armónica ponderada: |pendiente| <= 3·min(|secantes|), así que no se sobrepasa ningún keyframe
+    wBefore, wAfter = 2 * hAfter + hBefore, hAfter + 2 * hBefore
+    with np.errstate(divide='ignore', invalid='ignore'):
+        interior = (wBefore + wAfter) / (wBefore / before + wAfter / after)
+    sameDirection = (before * after > 0) & np.asarray(blended[:-1])[:, None] & np.asarray(blended[1:])[:, None]
+    slopes[1:-1] = np.where(sameDirection, interior, 0.0)
+    return slopes
+
+def interpolateHermite(start, end, startSlope, endSlope, ticks):
+    # Todos los ticks (ticks x servos) de un segmento de Hermite cúbico con pendientes en grados por tick
+    t = (np.arange(1, ticks + 1) / ticks)[:, None]
+    t2, t3 = t * t, t * t * t
+    return ((2 * t3 - 3 * t2 + 1) * start + (t3 - 2 * t2 + t) * ticks * startSlope
+            + (3 * t2 - 2 * t3) * end + (t3 - t2) * ticks * endSlope)
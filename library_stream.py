@@ -0,0 +1,136 @@
+from itertools import islice
+from interpolation import PROFILES
+from models import packAngles, unpackAngles
+from repositories.movement_repository import MovementRepository
+from repositories.position_repository import PositionRepository, MIN_KEY
+
+# Formato de intercambio de la biblioteca de movimientos: un registro por línea (NDJSON)
+#   {"type": "library", "version": 1}
+#   {"type": "movement", "name": "saludo"}
+#   {"type": "position", "time": 500, "profile": "linear", "angles": [{"id": 1, "angle": 90}, ...]}
+# Cada posición pertenece al último movimiento y el orden es el de aparición.
+LIBRARY_VERSION = 1
+PAGE_SIZE = 256  # Filas leídas o insertadas por sentencia
+CONFLICT_POLICIES = ('skip', 'replace', 'rename')
+
+class LibraryFormatError(ValueError):
+    pass
+
+def iterateLibrary(db, pageSize=PAGE_SIZE):
+    # Generador de registros; solo mantiene en memoria una página de filas
+    movementRepository = MovementRepository(db)
+    positionRepository = PositionRepository(db)
+    yield {"type": "library", "version": LIBRARY_VERSION}
+    lastId = 0
+    while True:
+        movements = movementRepository.findPageAfter(lastId, pageSize)
+        for movement in movements:
+            yield {"type": "movement", "name": movement.name}
+            lastOrder, lastPositionId = MIN_KEY, MIN_KEY
+            while True:
+                rows = positionRepository.findKeyframePage(movement.id, lastOrder, lastPositionId, pageSize)
+                for order, positionId, time, profile, angles in rows:
+                    yield {"type": "position", "time": time, "profile": profile, "angles": unpackAngles(angles)}
+                if len(rows) < pageSize:
+                    break
+                lastOrder, lastPositionId = rows[-1][0], rows[-1][1]
+        if len(movements) < pageSize:
+            return
+        lastId = movements[-1].id
+
+def takeRecords(records, count):
+    return list(islice(records, count))
+
+class LibraryImporter:
+    # Importa registros por trozos; cada trozo se aplica con un único INSERT por página de posiciones.
+    # Tras un LibraryFormatError el trozo se deshace y el importador no debe reutilizarse.
+    def __init__(self, db, onConflict='skip'):
+        if onConflict not in CONFLICT_POLICIES:
+            raise LibraryFormatError("on_conflict must be one of " + ", ".join(CONFLICT_POLICIES))
+        self.db = db
+        self.onConflict = onConflict
+        self.movementRepository = MovementRepository(db)
+        self.positionRepository = PositionRepository(db)
+        self.started = False
+        self.movementId = None  # None: se descartan las posiciones (movimiento omitido)
+        self.nextOrder = 1
+        self.movements = 0
+        self.positions = 0
+        self.skipped = 0
+
+    def importRecords(self, records):
+        rows = []
+        with self.db.atomic():
+            for record in records:
+                kind = record.get('type') if isinstance(record, dict) else None
+                if kind == 'library':
+                    if record.get('version') != LIBRARY_VERSION:
+                        raise LibraryFormatError(f"Unsupported library version: {record.get('version')}")
+                    self.started = True
+                elif not self.started:
+                    raise LibraryFormatError("The library header must come first")
+                elif kind == 'movement':
+                    self.flush(rows)
+                    self.startMovement(record)
+                elif kind == 'position':
+                    row = self.positionRow(record)
+                    if row is not None:
+                        rows.append(row)
+                        if len(rows) >= PAGE_SIZE:
+                            self.flush(rows)
+                else:
+                    raise LibraryFormatError(f"Unknown record type: {kind}")
+            self.flush(rows)
+
+    def flush(self, rows):
+        if rows:
+            self.positionRepository.saveMany(rows)
+            self.positions += len(rows)
+            rows.clear()
+
+    def startMovement(self, record):
+        name = record.get('name')
+        if not isinstance(name, str) or not name:
+            raise LibraryFormatError("Movement name is required")
+
+        self.nextOrder = 1
+        existing = self.movementRepository.findByName(name)
+        if existing is None:
+            self.movementId = self.movementRepository.save(name)
+        elif self.onConflict == 'skip':
+            self.movementId = None
+            self.skipped += 1
+            return
+        elif self.onConflict == 'replace':
+            self.positionRepository.deleteByMovementId(existing.id)
+            self.movementId = existing.id
+        else:
+            suffix = 2
+            while self.movementRepository.findByName(f"{name} ({suffix})"):
+                suffix += 1
+            self.movementId = self.movementRepository.save(f"{name} ({suffix})")
+        self.movements += 1
+
+    def positionRow(self, record):
+        if self.movementId is None:
+            if self.skipped:
+                return None
+            raise LibraryFormatError("Position record before any movement")
+
+        time = record.get('time')
+        profile = record.get('profile', 'linear')
+        angles = record.get('angles')
+        if not isinstance(time, int) or time < 0:
+            raise LibraryFormatError("Invalid time format: time must be a non-negative integer")
+        if profile not in PROFILES:
+            raise LibraryFormatError("Invalid profile: must be one of " + ", ".join(PROFILES))
+        frame = packAngles(angles) if isinstance(angles, list) else None
+        if frame is None:
+            raise LibraryFormatError("Invalid angles format: angles must be a list of dictionaries with integer id between 1 and 19 and angle between 0 and 180")
+
+        row = (self.nextOrder, time, frame, self.movementId, profile)
+        self.nextOrder += 1
+        return row
+
+    def getSummary(self):
+        return {"movements": self.movements, "positions": self.positions, "skipped": self.skipped}
@@ -1,18 +1,25 @@
 import asyncio
 from database import Database
+from db_worker import DatabaseWorker
 
 from services.button_manager import ButtonManager
 from services.servo_manager import ServoManager
 from services.movement_service import MovementService
 from services.position_service import PositionService
 from services.video_control_service import VideoControlService
+from services.library_service import LibraryService
+from services.motion_scheduler import MotionScheduler
 
 from websocket_handler import WebSocketHandler
 from main_loop import MainLoop
+from tick_scheduler import loadControlConfig
+from trajectory_cache import TrajectoryCache
+from repositories.cached_repository import RepositoryCache
+from metrics import startMetricsDump
 import websockets
 
-async def startDataServer(buttonManager, servoManager, movementService, positionService, videoControlService):
-    websocketHandler = WebSocketHandler(buttonManager, servoManager, movementService, positionService, videoControlService)
+async def startDataServer(dbWorker, buttonManager, servoManager, movementService, positionService, videoControlService, libraryService, motionScheduler):
+    websocketHandler = WebSocketHandler(dbWorker, buttonManager, servoManager, movementService, positionService, videoControlService, libraryService, motionScheduler)
     startServer = websockets.serve(websocketHandler.handleMessage, '0.0.0.0', 8765, max_size=None)
     await startServer
     print("Servidor WebSocket de datos iniciado en el puerto 8765")
@@ -26,19 +33,30 @@ async def startVideoServer(videoControlService):
 
 async def main():
     db = Database()
+    dbWorker = DatabaseWorker(db)
+    dbWorker.start()
     buttonManager = ButtonManager()
     servoManager = ServoManager()
-    movementService = MovementService(db)
-    positionService = PositionService(db)
+    repositoryCache = RepositoryCache(dbWorker)
+    controlPeriod, overrun = loadControlConfig()
+    trajectoryCache = TrajectoryCache(db, controlPeriod)
+    movementService = MovementService(repositoryCache, trajectoryCache)
+    motionScheduler = MotionScheduler(repositoryCache, trajectoryCache)
+    positionService = PositionService(repositoryCache, motionScheduler)
     videoControlService = VideoControlService()
-    mainLoop = MainLoop(buttonManager, servoManager, movementService, positionService, videoControlService)
+    libraryService = LibraryService(dbWorker, repositoryCache)
+    mainLoop = MainLoop(buttonManager, servoManager, movementService, positionService, videoControlService, motionScheduler, controlPeriod, overrun)
     
     # Iniciar los servidores WebSocket de manera asincrónica
     videoTask = asyncio.create_task(startVideoServer(videoControlService))
-    dataTask = asyncio.create_task(startDataServer(buttonManager, servoManager, movementService, positionService, videoControlService))
+    dataTask = asyncio.create_task(startDataServer(dbWorker, buttonManager, servoManager, movementService, positionService, videoControlService, libraryService, motionScheduler))
     mainLoop = asyncio.create_task(mainLoop.run())
+    metricsTask = asyncio.create_task(startMetricsDump())
 
-    await asyncio.gather(videoTask, dataTask, mainLoop)
+    try:
+        await asyncio.gather(videoTask, dataTask, mainLoop, metricsTask)
+    finally:
+        dbWorker.stop()
 
 if __name__ == "__main__":
     asyncio.run(main())
\ No newline at end of file
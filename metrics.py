@@ -0,0 +1,112 @@
+import asyncio
+import configparser
+import json
+import math
+import time
+
+# Histograma de latencias con cubetas logarítmicas fijas: registrar cuesta O(1) y no reserva memoria
+HISTOGRAM_MIN = 1e-5  # 10 µs
+HISTOGRAM_GROWTH = 1.2
+HISTOGRAM_BUCKETS = 100  # Hasta ~8 minutos
+
+class LatencyHistogram:
+    def __init__(self):
+        self.buckets = [0] * (HISTOGRAM_BUCKETS + 1)
+        self.count = 0
+        self.errors = 0
+        self.total = 0.0
+        self.max = 0.0
+
+    def record(self, seconds):
+        if seconds <= HISTOGRAM_MIN:
+            index = 0
+        else:
+            index = min(HISTOGRAM_BUCKETS, int(math.log(seconds / HISTOGRAM_MIN, HISTOGRAM_GROWTH)) + 1)
+        self.buckets[index] += 1
+        self.count += 1
+        self.total += seconds
+        if seconds > self.max:
+            self.max = seconds
+
+    def recordError(self):
+        self.errors += 1
+
+    def percentile(self, fraction):
+        if self.count == 0:
+            return 0.0
+        rank = fraction * self.count
+        seen = 0
+        for index, bucketCount in enumerate(self.buckets):
+            seen += bucketCount
+            if seen >= rank:
+                # Límite superior de la cubeta, acotado por el máximo observado
+                return min(self.max, HISTOGRAM_MIN * HISTOGRAM_GROWTH ** index)
+        return self.max
+
+    def snapshot(self):
+        return {
+            "count": self.count,
+            "errors": self.errors,
+            "mean_ms": self.total / self.count * 1000 if self.count else 0.0,
+            "p50_ms": self.percentile(0.50) * 1000,
+            "p95_ms": self.percentile(0.95) * 1000,
+            "p99_ms": self.percentile(0.99) * 1000,
+            "max_ms": self.max * 1000,
+        }
+
+class MetricsRegistry:
+    # Registro global siempre activo. Sin locks: los hilos solo incrementan contadores,
+    # y una instantánea puede mezclar valores de ticks consecutivos.
+    def __init__(self):
+        self.histograms = {}
+        self.counters = {}
+        self.gauges = {}
+
+    def histogram(self, name):
+        histogram = self.histograms.get(name)
+        if histogram is None:
+            histogram = self.histograms[name] = LatencyHistogram()
+        return histogram
+
+    def increment(self, name, amount=1):
+        self.counters[name] = self.counters.get(name, 0) + amount
+
+    def gauge(self, name, function):
+        # El valor se calcula al pedir la instantánea (profundidad de colas, clientes, ...)
+        self.gauges[name] = function
+
+    def snapshot(self):
+        gauges = {}
+        for name, function in list(self.gauges.items()):
+            try:
+                gauges[name] = function()
+            except Exception as e:
+                gauges[name] = f"error: {e}"
+        return {
+            "timestamp": time.time(),
+            "histograms": {name: histogram.snapshot() for name, histogram in list(self.histograms.items())},
+            "counters": dict(self.counters),
+            "gauges": gauges,
+        }
+
+    async def dumpPeriodically(self, path, interval):
+        # Una línea JSON por instantánea, para análisis post-mortem
+        while True:
+            await asyncio.sleep(interval)
+            line = json.dumps(self.snapshot(), default=str)
+            try:
+                with open(path, 'a') as dumpFile:
+                    dumpFile.write(line + "\n")
+            except OSError as e:
+                print("No se pudieron volcar las métricas:", e)
+
+registry = MetricsRegistry()
+
+async def startMetricsDump(configFile='config.ini'):
+    config = configparser.ConfigParser()
+    config.read(configFile)
+    section = config['Metrics'] if 'Metrics' in config else {}
+    path = section.get('dump_file', '')
+    if not path:
+        return
+    await registry.dumpPeriodically(path, float(section.get('dump_interval', '60')))
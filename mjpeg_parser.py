@@ -0,0 +1,45 @@
+SOI = b'\xff\xd8'  # Inicio de imagen JPEG
+EOI = b'\xff\xd9'  # Fin de imagen JPEG
+MAX_FRAME_SIZE = 4 * 1024 * 1024
+
+class MjpegFrameParser:
+    # Separa un flujo MJPEG en frames JPEG completos (de SOI a EOI, ambos incluidos)
+    def __init__(self, maxFrameSize=MAX_FRAME_SIZE):
+        self.buffer = bytearray()
+        self.searchFrom = 0
+        self.maxFrameSize = maxFrameSize
+        self.discardedBytes = 0
+
+    def feed(self, data):
+        self.buffer += data
+        frames = []
+        while True:
+            start = self.buffer.find(SOI)
+            if start < 0:
+                # Conservar un posible 0xFF final que sea la mitad de un SOI
+                keep = 1 if self.buffer.endswith(b'\xff') else 0
+                self.discardedBytes += len(self.buffer) - keep
+                del self.buffer[:len(self.buffer) - keep]
+                self.searchFrom = 0
+                break
+            if start > 0:
+                self.discardedBytes += start
+                del self.buffer[:start]
+                self.searchFrom = max(0, self.searchFrom - start)
+
+            # Los bytes 0xFF dentro de los datos comprimidos van seguidos de 0x00, así que
+            # FF D9 solo aparece como marcador de fin
+            end = self.buffer.find(EOI, max(2, self.searchFrom))
+            if end < 0:
+                if len(self.buffer) > self.maxFrameSize:
+                    # Frame corrupto o demasiado grande: se descarta y se busca el siguiente SOI
+                    self.discardedBytes += 2
+                    del self.buffer[:2]
+                    self.searchFrom = 0
+                    continue
+                self.searchFrom = max(2, len(self.buffer) - 1)
+                break
+            frames.append(bytes(self.buffer[:end + 2]))
+            del self.buffer[:end + 2]
+            self.searchFrom = 0
+        return frames
@@ -1,5 +1,8 @@
 from dataclasses import dataclass, asdict
 
+NUM_SERVOS = 19
+ANGLE_UNSET = 0xFF  # Servo ausente en un frame de ángulos empaquetado
+
 @dataclass
 class Button:
     id: int
@@ -21,4 +24,30 @@ class Position:
     order:int
     time: int
     angles: list
-    movement_id: int
\ No newline at end of file
+    movement_id: int
+    profile: str = 'linear'
+
+def packAngles(angles):
+    # [{"id": 1, "angle": 90}, ...] -> un byte por id de servo (id - 1), ANGLE_UNSET si falta
+    frame = bytearray([ANGLE_UNSET]) * NUM_SERVOS
+    for angle in angles:
+        if not isinstance(angle, dict):
+            return None
+        servoId = angle.get('id')
+        value = angle.get('angle')
+        if not isinstance(servoId, int) or not isinstance(value, int) or not 1 <= servoId <= NUM_SERVOS or not 0 <= value <= 180:
+            return None
+        frame[servoId - 1] = value
+    return bytes(frame)
+
+def unpackAngles(frame):
+    if len(frame) > NUM_SERVOS:
+        return None
+    angles = []
+    for index, value in enumerate(frame):
+        if value is None or value == ANGLE_UNSET:
+            continue
+        if not isinstance(value, int):
+            return None
+        angles.append({"id": index + 1, "angle": value})
+    return angles
@@ -0,0 +1,243 @@
+import heapq
+import itertools
+import math
+import os
+import queue
+import threading
+import time
+from dataclasses import dataclass
+import numpy as np
+from metrics import registry
+from tick_scheduler import TickScheduler, SKIP
+
+CONTROL_PERIOD = 0.01  # 10 ms por tick
+PROGRESS_INTERVAL = 0.1  # Segundos entre eventos de progreso
+
+@dataclass
+class MotionJob:
+    id: int
+    trajectory: object
+    priority: int = 0  # Mayor prioridad se reproduce antes
+    loops: int = 1  # 0 = repetir hasta que se detenga
+    speed: float = 1.0
+    preempt: bool = False  # Interrumpe el movimiento en curso si es de menor prioridad
+
+class MotionEngine:
+    def __init__(self, servoMotor, servoManager, period=CONTROL_PERIOD, overrun=SKIP):
+        self.servoMotor = servoMotor
+        self.servoManager = servoManager
+        self.period = period
+        self.ticker = TickScheduler(period, 'motion', overrun)
+        self.commands = queue.Queue()
+        self.lock = threading.Lock()
+        self.pendingMoves = 0
+        self.thread = None
+        self.eventListener = None  # Llamado desde el hilo del motor con cada evento de reproducción
+
+        # Estado de reproducción: solo lo toca el hilo del motor
+        self.jobQueue = []  # heap (-prioridad, secuencia, trabajo)
+        self.sequence = itertools.count()
+        self.current = None
+        self.endState = None
+        self.paused = False
+        self.shuttingDown = False
+
+        self.timingError = registry.histogram('motion.movement_timing_error')
+        registry.gauge('motion.command_queue_depth', self.commands.qsize)
+        registry.gauge('motion.pending_moves', lambda: self.pendingMoves)
+
+    def start(self):
+        if self.thread is not None:
+            return
+        self.thread = threading.Thread(target=self.run, name="MotionEngine", daemon=True)
+        self.thread.start()
+
+    def stop(self):
+        if self.thread is None:
+            return
+        self.commands.put(('shutdown',))
+        self.thread.join()
+        self.thread = None
+
+    # Comandos enviados desde el bucle asyncio (thread-safe)
+    def submit(self, job):
+        with self.lock:
+            self.pendingMoves += 1
+        self.commands.put(('submit', job))
+
+    def cancel(self, jobId):
+        self.commands.put(('cancel', jobId))
+
+    def abortAll(self):
+        self.commands.put(('abort',))
+
+    def pause(self):
+        self.commands.put(('pause',))
+
+    def resume(self):
+        self.commands.put(('resume',))
+
+    def setSpeed(self, speed):
+        self.commands.put(('speed', speed))
+
+    def holdAngles(self, angles):
+        self.commands.put(('hold', dict(angles)))
+
+    def isMoving(self):
+        with self.lock:
+            return self.pendingMoves > 0
+
+    def setRealtimePriority(self):
+        # En Linux el pid 0 corresponde al hilo actual
+        try:
+            os.sched_setscheduler(0, os.SCHED_FIFO, os.sched_param(50))
+        except (AttributeError, OSError) as e:
+            print("No se pudo asignar prioridad de tiempo real al motor de movimiento:", e)
+
+    def run(self):
+        self.setRealtimePriority()
+        while not self.shuttingDown:
+            self.handleCommand(self.commands.get())
+            # Los movimientos encolados se encadenan sobre la misma rejilla de ticks, sin tiempo muerto
+            chained = False
+            while self.jobQueue and not self.shuttingDown:
+                _, _, job = heapq.heappop(self.jobQueue)
+                self.playJob(job, chained)
+                chained = True
+
+    def handleCommand(self, command):
+        kind = command[0]
+        if kind == 'shutdown':
+            self.shuttingDown = True
+            if self.current is not None:
+                self.endState = 'aborted'
+        elif kind == 'hold':
+            # Durante un movimiento (o en pausa) los servos ya los controla el movimiento
+            if self.current is None:
+                self.servoMotor.setServoAngles({servoId - 1: angle for servoId, angle in command[1].items()})
+        elif kind == 'submit':
+            job = command[1]
+            heapq.heappush(self.jobQueue, (-job.priority, next(self.sequence), job))
+            self.emit(job, 'queued')
+            if self.current is not None and job.preempt and job.priority > self.current.priority:
+                self.endState = 'preempted'
+        elif kind == 'cancel':
+            if self.current is not None and self.current.id == command[1]:
+                self.endState = 'cancelled'
+                return
+            for entry in self.jobQueue:
+                if entry[2].id == command[1]:
+                    self.jobQueue.remove(entry)
+                    heapq.heapify(self.jobQueue)
+                    self.finishJob(entry[2], 'cancelled')
+                    return
+        elif kind == 'abort':
+            for _, _, job in sorted(self.jobQueue):
+                self.finishJob(job, 'cancelled')
+            self.jobQueue = []
+            if self.current is not None:
+                self.endState = 'aborted'
+        elif kind == 'pause':
+            if self.current is not None and not self.paused:
+                self.paused = True
+                self.emit(self.current, 'paused')
+        elif kind == 'resume':
+            if self.current is not None and self.paused:
+                self.paused = False
+                self.emit(self.current, 'resumed')
+        elif kind == 'speed':
+            if self.current is not None:
+                self.current.speed = command[1]
+
+    def drainCommands(self):
+        while True:
+            try:
+                command = self.commands.get_nowait()
+            except queue.Empty:
+                return
+            self.handleCommand(command)
+
+    def emit(self, job, event, **details):
+        if self.eventListener is None:
+            return
+        self.eventListener({"event": event, "job_id": job.id, "movement_id": job.trajectory.movementId, **details})
+
+    def finishJob(self, job, state, **details):
+        with self.lock:
+            self.pendingMoves -= 1
+        self.emit(job, state, **details)
+
+    def playJob(self, job, chained):
+        # Reproduce un trabajo (con sus repeticiones); encadenado al anterior sigue con sus mismos deadlines
+        self.current = job
+        self.endState = None
+        self.paused = False
+        trajectory = job.trajectory
+        numTicks = trajectory.numTicks
+        # Los ángulos finales se guardan en estos servos aunque loadConfig() cambie la lista entretanto
+        servos = list(self.servoManager.servos)
+        initialAngles = np.full(self.servoMotor.numChannels, np.nan)
+        for servo in servos:
+            if 1 <= servo.id <= len(initialAngles):
+                initialAngles[servo.id - 1] = servo.angle
+
+        self.emit(job, 'started', loops=job.loops)
+        if not chained:
+            self.ticker.reset()
+        startTime = self.ticker.nextDeadline - self.period
+        undisturbed = job.speed == 1.0
+        progress = 0.0  # Ticks de trayectoria avanzados (escalados por la velocidad)
+        loop = 1
+        frame = None
+        lastProgressTime = startTime
+
+        while numTicks > 0:
+            # Si se saltan ticks vencidos la trayectoria avanza lo mismo y no se desfasa del reloj
+            missed = self.ticker.wait()
+            tickTime = time.monotonic()
+
+            self.drainCommands()
+            if self.paused:
+                undisturbed = False
+                while self.paused and self.endState is None:
+                    self.handleCommand(self.commands.get())
+                self.ticker.reset()
+            if self.endState is not None:
+                break
+            if job.speed != 1.0:
+                undisturbed = False
+
+            progress += (1 + missed) * job.speed
+            index = min(numTicks - 1, max(0, math.ceil(progress - 1e-9) - 1))
+            frame = trajectory.frameAt(index, initialAngles)
+            self.servoMotor.writeFrame(frame)
+
+            if tickTime - lastProgressTime >= PROGRESS_INTERVAL:
+                lastProgressTime = tickTime
+                self.emit(job, 'progress', loop=loop, loops=job.loops, progress=round((index + 1) / numTicks, 3))
+
+            if index == numTicks - 1:
+                if loop == job.loops:
+                    self.endState = 'completed'
+                    break
+                # Siguiente repetición: las rampas parten de donde terminó la anterior
+                loop += 1
+                progress -= numTicks
+                initialAngles = np.where(np.isnan(frame), initialAngles, frame)
+                self.emit(job, 'loop', loop=loop, loops=job.loops)
+
+        if self.endState is None:
+            self.endState = 'completed'
+        if self.endState == 'completed' and undisturbed:
+            # Diferencia entre la duración real y la planificada del movimiento
+            self.timingError.record(abs(time.monotonic() - startTime - job.loops * numTicks * self.period))
+        registry.increment('motion.movements_played')
+
+        # Actualizar los ángulos de los servos con el último frame escrito
+        if frame is not None:
+            for servo in servos:
+                if 1 <= servo.id <= len(frame) and not np.isnan(frame[servo.id - 1]):
+                    servo.angle = round(float(frame[servo.id - 1]))
+
+        self.current = None
+        self.finishJob(job, self.endState, loop=loop)
@@ -0,0 +1,52 @@
+import base64
+import json
+from dataclasses import asdict, fields
+
+# Paginación por cursor de los listados getAll*. El cursor es opaco para el cliente: codifica
+# la clave de ordenación del último elemento enviado, así que cada página es una búsqueda por clave.
+MAX_PAGE_SIZE = 500
+
+class PageRequestError(ValueError):
+    pass
+
+def encodeCursor(key):
+    return base64.urlsafe_b64encode(json.dumps(list(key)).encode()).decode()
+
+def decodeCursor(cursor, keyLength):
+    try:
+        key = json.loads(base64.urlsafe_b64decode(cursor.encode()))
+    except (ValueError, AttributeError):
+        raise PageRequestError("Invalid cursor")
+    if not isinstance(key, list) or len(key) != keyLength or not all(isinstance(value, int) for value in key):
+        raise PageRequestError("Invalid cursor")
+    return tuple(key)
+
+def parsePageRequest(payload, itemClass, keyLength):
+    # Devuelve (limit, after, fields); sin limit se devuelve el listado completo, como antes
+    limit = payload.get('limit')
+    cursor = payload.get('cursor')
+    selectedFields = payload.get('fields')
+
+    if limit is not None and (not isinstance(limit, int) or not 1 <= limit <= MAX_PAGE_SIZE):
+        raise PageRequestError(f"limit must be an integer between 1 and {MAX_PAGE_SIZE}")
+    if cursor is not None and not isinstance(cursor, str):
+        raise PageRequestError("Invalid cursor")
+    after = decodeCursor(cursor, keyLength) if cursor is not None else None
+
+    if selectedFields is not None:
+        allowed = [field.name for field in fields(itemClass)]
+        if not isinstance(selectedFields, list) or not selectedFields or not all(field in allowed for field in selectedFields):
+            raise PageRequestError("fields must be a non-empty list of: " + ", ".join(allowed))
+    return limit, after, selectedFields
+
+def buildPage(items, totalItems, limit, selectedFields, keyOf):
+    # items trae hasta limit + 1 elementos: el sobrante solo indica que hay otra página
+    nextCursor = None
+    if limit is not None and len(items) > limit:
+        items = items[:limit]
+        nextCursor = encodeCursor(keyOf(items[-1]))
+    if selectedFields is None:
+        content = [asdict(item) for item in items]
+    else:
+        content = [{field: getattr(item, field) for field in selectedFields} for item in items]
+    return {"total_items": totalItems, "content": content, "next_cursor": nextCursor}
@@ -0,0 +1,14 @@
+class AsyncRepository:
+    # Versión asíncrona de un repositorio: cada método se ejecuta en el hilo de DatabaseWorker
+    def __init__(self, repository, worker):
+        self.repository = repository
+        self.worker = worker
+
+    def __getattr__(self, name):
+        method = getattr(self.repository, name)
+
+        async def call(*args):
+            return await self.worker.run(method, *args)
+
+        setattr(self, name, call)
+        return call
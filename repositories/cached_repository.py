@@ -0,0 +1,246 @@
+import asyncio
+import bisect
+from dataclasses import replace
+from models import Movement, packAngles
+from repositories.async_repository import AsyncRepository
+from repositories.movement_repository import MovementRepository
+from repositories.position_repository import PositionRepository
+
+class RepositoryCache:
+    # Copia en memoria de movimientos y posiciones (ordenadas por movimiento). Solo se usa desde
+    # el bucle de eventos: las lecturas no tocan el disco y las escrituras pasan primero por SQLite
+    # y se aplican aquí cuando terminan, en el mismo orden FIFO en que las ejecuta DatabaseWorker.
+    def __init__(self, dbWorker):
+        self.dbWorker = dbWorker
+        self.movementRepository = AsyncRepository(MovementRepository(dbWorker.db), dbWorker)
+        self.positionRepository = AsyncRepository(PositionRepository(dbWorker.db), dbWorker)
+        self.loaded = False
+        self.loadLock = asyncio.Lock()
+        self.movements = {}
+        self.movementIdsByName = {}
+        self.movementIds = []  # Ids ordenados: las páginas se buscan por bisección
+        self.positions = {}  # movement_id -> [Position] por order
+        self.positionsById = {}
+        self.versions = {}
+        self.versionCounter = 0
+        dbWorker.addRollbackListener(self.invalidateAll)
+
+    async def ensureLoaded(self):
+        # Las escrituras de una transacción abierta ya están en la caché: solo las ve quien la abrió
+        await self.dbWorker.waitForTransaction()
+        if self.loaded:
+            return
+        async with self.loadLock:
+            if self.loaded:
+                return
+            # Un único trabajo: una escritura que terminó durante la carga ya está incluida en ella
+            movements, positions = await self.dbWorker.run(self.readSnapshot)
+            self.movements = {movement.id: movement for movement in movements}
+            self.movementIdsByName = {movement.name: movement.id for movement in movements}
+            self.movementIds = sorted(self.movements)
+            self.positions = {movement.id: [] for movement in movements}
+            self.positionsById = {}
+            for position in positions:
+                self.positions.setdefault(position.movement_id, []).append(position)
+                self.positionsById[position.id] = position
+            for movementId, movementPositions in self.positions.items():
+                movementPositions.sort(key=lambda position: (position.order, position.id))
+                self.bumpVersion(movementId)
+            self.loaded = True
+
+    def readSnapshot(self):
+        # Hilo de DatabaseWorker
+        return self.movementRepository.repository.findAll(), self.positionRepository.repository.findAll()
+
+    def invalidateAll(self):
+        # Escrituras fuera de la caché (importaciones, rollback de /app/batch): se recarga en la próxima lectura
+        self.loaded = False
+
+    def bumpVersion(self, movementId):
+        self.versionCounter += 1
+        self.versions[movementId] = self.versionCounter
+
+    async def getVersion(self, movementId):
+        # Crece en cada cambio del movimiento o de sus posiciones
+        await self.ensureLoaded()
+        return self.versions.get(movementId, 0)
+
+    def storePositions(self, movementId, positions):
+        positions.sort(key=lambda position: (position.order, position.id))
+        self.positions[movementId] = positions
+        for position in positions:
+            self.positionsById[position.id] = position
+        self.bumpVersion(movementId)
+
+class CachedMovementRepository:
+    # Misma interfaz que MovementRepository, asíncrona y servida desde RepositoryCache
+    def __init__(self, cache):
+        self.cache = cache
+
+    async def save(self, name):
+        id = await self.cache.movementRepository.save(name)
+        if self.cache.loaded:
+            self.cache.movements[id] = Movement(id=id, name=name)
+            self.cache.movementIdsByName[name] = id
+            bisect.insort(self.cache.movementIds, id)
+            self.cache.storePositions(id, [])
+        return id
+
+    async def updateById(self, id, name):
+        await self.cache.movementRepository.updateById(id, name)
+        movement = self.cache.movements.get(id)
+        if self.cache.loaded and movement:
+            self.cache.movementIdsByName.pop(movement.name, None)
+            self.cache.movements[id] = Movement(id=id, name=name)
+            self.cache.movementIdsByName[name] = id
+            self.cache.bumpVersion(id)
+
+    async def deleteById(self, id):
+        await self.cache.movementRepository.deleteById(id)
+        movement = self.cache.movements.get(id)
+        if self.cache.loaded and movement:
+            del self.cache.movements[id]
+            self.cache.movementIdsByName.pop(movement.name, None)
+            self.cache.movementIds.pop(bisect.bisect_left(self.cache.movementIds, id))
+            for position in self.cache.positions.pop(id, []):
+                self.cache.positionsById.pop(position.id, None)
+            self.cache.bumpVersion(id)
+
+    async def findById(self, id):
+        await self.cache.ensureLoaded()
+        return self.cache.movements.get(id)
+
+    async def findByName(self, name):
+        await self.cache.ensureLoaded()
+        id = self.cache.movementIdsByName.get(name)
+        return self.cache.movements.get(id) if id is not None else None
+
+    async def findAll(self):
+        await self.cache.ensureLoaded()
+        return sorted(self.cache.movements.values(), key=lambda movement: movement.id)
+
+    async def findPageAfter(self, last_id, limit=None):
+        await self.cache.ensureLoaded()
+        ids = self.cache.movementIds
+        start = bisect.bisect_right(ids, last_id)
+        return [self.cache.movements[id] for id in ids[start:None if limit is None else start + limit]]
+
+    async def countAll(self):
+        await self.cache.ensureLoaded()
+        return len(self.cache.movements)
+
+class CachedPositionRepository:
+    # Misma interfaz que PositionRepository, asíncrona y servida desde RepositoryCache
+    def __init__(self, cache):
+        self.cache = cache
+
+    async def append(self, time, angles, movement_id, profile='linear'):
+        id, order = await self.cache.positionRepository.append(time, angles, movement_id, profile)
+        if self.cache.loaded:
+            self.insert(id, order, time, angles, movement_id, profile)
+        return id
+
+    async def insertAt(self, order, time, angles, movement_id, profile='linear'):
+        id = await self.cache.positionRepository.insertAt(order, time, angles, movement_id, profile)
+        if self.cache.loaded and id is not None:
+            shifted = [replace(position, order=position.order + 1) if position.order >= order else position
+                       for position in self.cache.positions.get(movement_id, [])]
+            self.cache.storePositions(movement_id, shifted)
+            self.insert(id, order, time, angles, movement_id, profile)
+        return id
+
+    def insert(self, id, order, time, angles, movement_id, profile):
+        # Ángulos con la misma forma que devuelve la base de datos (ordenados por id)
+        position = self.cache.positionRepository.repository.rowToPosition((id, order, time, packAngles(angles), movement_id, profile))
+        self.cache.storePositions(movement_id, self.cache.positions.get(movement_id, []) + [position])
+
+    async def reorder(self, movement_id, ids):
+        if not await self.cache.positionRepository.reorder(movement_id, ids):
+            return False
+        if self.cache.loaded:
+            orders = {id: index + 1 for index, id in enumerate(ids)}
+            self.cache.storePositions(movement_id, [replace(position, order=orders[position.id])
+                                                    for position in self.cache.positions.get(movement_id, [])])
+        return True
+
+    async def updateById(self, id, time, angles, profile='linear'):
+        await self.cache.positionRepository.updateById(id, time, angles, profile)
+        position = self.cache.positionsById.get(id)
+        if self.cache.loaded and position:
+            positions = [other for other in self.cache.positions[position.movement_id] if other.id != id]
+            self.cache.storePositions(position.movement_id, positions)
+            self.insert(id, position.order, time, angles, position.movement_id, profile)
+
+    async def deleteAndCompact(self, id, order, movement_id):
+        await self.cache.positionRepository.deleteAndCompact(id, order, movement_id)
+        if self.cache.loaded:
+            self.cache.positionsById.pop(id, None)
+            self.cache.storePositions(movement_id, [replace(position, order=position.order - 1) if position.order > order else position
+                                                    for position in self.cache.positions.get(movement_id, []) if position.id != id])
+
+    async def swapWithPrevious(self, id, order, movement_id):
+        await self.cache.positionRepository.swapWithPrevious(id, order, movement_id)
+        self.swapOrders(id, order, order - 1, movement_id)
+
+    async def swapWithNext(self, id, order, movement_id):
+        await self.cache.positionRepository.swapWithNext(id, order, movement_id)
+        self.swapOrders(id, order, order + 1, movement_id)
+
+    def swapOrders(self, id, order, otherOrder, movement_id):
+        # Igual que el repositorio: sin vecino con otherOrder no se cambia nada
+        positions = self.cache.positions.get(movement_id, [])
+        if not self.cache.loaded or not any(position.order == otherOrder for position in positions):
+            return
+        swapped = []
+        for position in positions:
+            if position.id == id:
+                position = replace(position, order=otherOrder)
+            elif position.order == otherOrder:
+                position = replace(position, order=order)
+            swapped.append(position)
+        self.cache.storePositions(movement_id, swapped)
+
+    async def findMaxOrder(self, movement_id):
+        await self.cache.ensureLoaded()
+        positions = self.cache.positions.get(movement_id)
+        return max(position.order for position in positions) if positions else None
+
+    async def findById(self, id):
+        await self.cache.ensureLoaded()
+        return self.cache.positionsById.get(id)
+
+    async def findAll(self):
+        await self.cache.ensureLoaded()
+        return [position for positions in self.cache.positions.values() for position in positions]
+
+    async def findAllByMovementId(self, movement_id):
+        await self.cache.ensureLoaded()
+        return list(self.cache.positions.get(movement_id, []))
+
+    async def findPage(self, after, limit=None):
+        await self.cache.ensureLoaded()
+        page = []
+        ids = self.cache.movementIds
+        for movementId in ids[0 if after is None else bisect.bisect_left(ids, after[0]):]:
+            remaining = None if limit is None else limit - len(page)
+            page += self.slice(self.cache.positions.get(movementId, []), after[1:] if after and movementId == after[0] else None, remaining)
+            if limit is not None and len(page) >= limit:
+                break
+        return page
+
+    async def findPageByMovementId(self, movement_id, after, limit=None):
+        await self.cache.ensureLoaded()
+        return self.slice(self.cache.positions.get(movement_id, []), after, limit)
+
+    def slice(self, positions, after, limit):
+        # positions está ordenada por (order, id): búsqueda binaria de la clave del cursor
+        start = 0 if after is None else bisect.bisect_right(positions, tuple(after), key=lambda position: (position.order, position.id))
+        return positions[start:None if limit is None else start + limit]
+
+    async def countAll(self):
+        await self.cache.ensureLoaded()
+        return len(self.cache.positionsById)
+
+    async def countByMovementId(self, movement_id):
+        await self.cache.ensureLoaded()
+        return len(self.cache.positions.get(movement_id, []))
@@ -6,17 +6,17 @@ class MovementRepository:
 
     def save(self, name):
         cursor = self.db.conn.execute("INSERT INTO movements (name) VALUES (?)", (name,))
-        self.db.conn.commit()
+        self.db.commit()
         return cursor.lastrowid
 
     def updateById(self, id, name):
         self.db.conn.execute("UPDATE movements SET name = ? WHERE id = ?", (name, id))
-        self.db.conn.commit()
+        self.db.commit()
 
     def deleteById(self, id):
         self.db.conn.execute("DELETE FROM positions WHERE movement_id = ?", (id,))
         self.db.conn.execute("DELETE FROM movements WHERE id = ?", (id,))
-        self.db.conn.commit()
+        self.db.commit()
 
     def findById(self, id):
         cursor = self.db.conn.execute("SELECT id, name FROM movements WHERE id = ?", (id,))
@@ -36,3 +36,9 @@ class MovementRepository:
         cursor = self.db.conn.execute("SELECT id, name FROM movements")
         rows = cursor.fetchall()
         return [Movement(id=row[0], name=row[1]) for row in rows]
+
+    def findPageAfter(self, last_id, limit=None):
+        # limit None: sin límite (LIMIT -1 en SQLite)
+        cursor = self.db.conn.execute("SELECT id, name FROM movements WHERE id > ? ORDER BY id LIMIT ?", (last_id, -1 if limit is None else limit))
+        rows = cursor.fetchall()
+        return [Movement(id=row[0], name=row[1]) for row in rows]
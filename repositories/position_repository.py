@@ -1,37 +1,81 @@
 import json
-from models import Position
+from models import Position, packAngles, unpackAngles
+
+MIN_KEY = -2 ** 63  # Menor que cualquier id u order
 
 class PositionRepository:
     def __init__(self, db):
         self.db = db
 
-    def save(self, order, time, angles, movement_id):
-        angles_json = json.dumps(angles)
+    def save(self, order, time, angles, movement_id, profile='linear'):
         cursor = self.db.conn.execute(
-            'INSERT INTO positions ("order", time, angles, movement_id) VALUES (?, ?, ?, ?)',
-            (order, time, angles_json, movement_id)
+            'INSERT INTO positions ("order", time, angles, movement_id, profile) VALUES (?, ?, ?, ?, ?)',
+            (order, time, self.encodeAngles(angles), movement_id, profile)
         )
-        self.db.conn.commit()
+        self.db.commit()
+        return cursor.lastrowid
+
+    def append(self, time, angles, movement_id, profile='linear'):
+        # Calcula el orden y guarda en el mismo trabajo, sin que otra petición se intercale; devuelve (id, order).
+        # No se toma de RepositoryCache: la caché solo refleja los trabajos ya terminados, no los que esperan
+        # en la cola del worker. El MAX usa idx_positions_movement_order (una búsqueda, no un recorrido).
+        order = (self.findMaxOrder(movement_id) or 0) + 1
+        return self.save(order, time, angles, movement_id, profile), order
+
+    def insertAt(self, order, time, angles, movement_id, profile='linear'):
+        # Abre un hueco en "order" y guarda; devuelve None si order no está entre 1 y el máximo + 1
+        with self.db.atomic():
+            if order > (self.findMaxOrder(movement_id) or 0) + 1:
+                return None
+            self.db.conn.execute(
+                'UPDATE positions SET "order" = "order" + 1 WHERE movement_id = ? AND "order" >= ?',
+                (movement_id, order)
+            )
+            cursor = self.db.conn.execute(
+                'INSERT INTO positions ("order", time, angles, movement_id, profile) VALUES (?, ?, ?, ?, ?)',
+                (order, time, self.encodeAngles(angles), movement_id, profile)
+            )
         return cursor.lastrowid
 
-    def updateById(self, id, time, angles):
-        angles_json = json.dumps(angles)
+    def reorder(self, movement_id, ids):
+        # ids: todas las posiciones del movimiento en el nuevo orden; False si no coinciden
+        with self.db.atomic():
+            cursor = self.db.conn.execute('SELECT id FROM positions WHERE movement_id = ?', (movement_id,))
+            if {row[0] for row in cursor} != set(ids) or len(ids) != len(set(ids)):
+                return False
+            # Una sola sentencia: el nuevo orden es la posición (1-based) del id en la lista
+            self.db.conn.execute(
+                'UPDATE positions SET "order" = (SELECT key + 1 FROM json_each(?) WHERE value = positions.id) WHERE movement_id = ?',
+                (json.dumps(ids), movement_id)
+            )
+        return True
+
+    def updateById(self, id, time, angles, profile='linear'):
         self.db.conn.execute(
-            'UPDATE positions SET time = ?, angles = ? WHERE id = ?',
-            (time, angles_json, id)
+            'UPDATE positions SET time = ?, angles = ?, profile = ? WHERE id = ?',
+            (time, self.encodeAngles(angles), profile, id)
         )
-        self.db.conn.commit()
+        self.db.commit()
 
     def deleteById(self, id):
         self.db.conn.execute('DELETE FROM positions WHERE id = ?', (id,))
-        self.db.conn.commit()
+        self.db.commit()
+
+    def deleteAndCompact(self, id, order, movement_id):
+        # Borrado y renumeración de las posiciones siguientes en un único commit
+        with self.db.atomic():
+            self.db.conn.execute('DELETE FROM positions WHERE id = ?', (id,))
+            self.db.conn.execute(
+                'UPDATE positions SET "order" = "order" - 1 WHERE "order" > ? AND movement_id = ?',
+                (order, movement_id)
+            )
 
     def decrementOrder(self, order, movement_id):
         self.db.conn.execute(
             'UPDATE positions SET "order" = "order" - 1 WHERE "order" > ? AND movement_id = ?',
             (order, movement_id)
         )
-        self.db.conn.commit()
+        self.db.commit()
 
     def swapPositions(self, id1, order1, id2, order2):
         self.db.conn.execute(
@@ -42,7 +86,7 @@ class PositionRepository:
             'UPDATE positions SET "order" = ? WHERE id = ?',
             (order1, id2)
         )
-        self.db.conn.commit()
+        self.db.commit()
 
     def swapWithPrevious(self, id, order, movement_id):
         cursor = self.db.conn.execute(
@@ -73,18 +117,53 @@ class PositionRepository:
         return max_order
 
     def findById(self, id):
-        cursor = self.db.conn.execute('SELECT id, "order", time, angles, movement_id FROM positions WHERE id = ?', (id,))
+        cursor = self.db.conn.execute('SELECT id, "order", time, angles, movement_id, profile FROM positions WHERE id = ?', (id,))
         row = cursor.fetchone()
         if row:
-            return Position(id=row[0], order=row[1], time=row[2], angles=json.loads(row[3]), movement_id=row[4])
+            return self.rowToPosition(row)
         return None
 
     def findAll(self):
-        cursor = self.db.conn.execute('SELECT id, "order", time, angles, movement_id FROM positions')
+        cursor = self.db.conn.execute('SELECT id, "order", time, angles, movement_id, profile FROM positions')
         rows = cursor.fetchall()
-        return [Position(id=row[0], order=row[1], time=row[2], angles=json.loads(row[3]), movement_id=row[4]) for row in rows]
+        return [self.rowToPosition(row) for row in rows]
 
     def findAllByMovementId(self, movement_id):
-        cursor = self.db.conn.execute('SELECT id, "order", time, angles, movement_id FROM positions WHERE movement_id = ? ORDER BY "order"', (movement_id,))
+        cursor = self.db.conn.execute('SELECT id, "order", time, angles, movement_id, profile FROM positions WHERE movement_id = ? ORDER BY "order"', (movement_id,))
         rows = cursor.fetchall()
-        return [Position(id=row[0], order=row[1], time=row[2], angles=json.loads(row[3]), movement_id=row[4]) for row in rows]
+        return [self.rowToPosition(row) for row in rows]
+
+    def findKeyframesByMovementId(self, movement_id):
+        # Para el compilador de trayectorias: (time, profile, frame) con el frame empaquetado tal cual
+        cursor = self.db.conn.execute('SELECT time, profile, angles FROM positions WHERE movement_id = ? ORDER BY "order"', (movement_id,))
+        return cursor.fetchall()
+
+    def findKeyframePage(self, movement_id, after_order, after_id, limit):
+        # Paginación por clave (movement_id, "order", id): cada página es una búsqueda en el índice
+        cursor = self.db.conn.execute(
+            'SELECT "order", id, time, profile, angles FROM positions WHERE movement_id = ? AND ("order", id) > (?, ?) ORDER BY "order", id LIMIT ?',
+            (movement_id, after_order, after_id, limit)
+        )
+        return cursor.fetchall()
+
+    def saveMany(self, rows):
+        # rows: [(order, time, angles empaquetados, movement_id, profile), ...]
+        self.db.conn.executemany(
+            'INSERT INTO positions ("order", time, angles, movement_id, profile) VALUES (?, ?, ?, ?, ?)',
+            rows
+        )
+        self.db.commit()
+
+    def deleteByMovementId(self, movement_id):
+        self.db.conn.execute('DELETE FROM positions WHERE movement_id = ?', (movement_id,))
+        self.db.commit()
+
+    def encodeAngles(self, angles):
+        # Un byte por servo (ver models.packAngles); el servicio ya validó los ángulos
+        frame = packAngles(angles)
+        if frame is None:
+            raise ValueError("Invalid angles")
+        return frame
+
+    def rowToPosition(self, row):
+        return Position(id=row[0], order=row[1], time=row[2], angles=unpackAngles(row[3]), movement_id=row[4], profile=row[5])
@@ -1,16 +1,43 @@
-import json
+from wire_codec import getSession, packPayload
+from router import markRouteError
+
+class BatchCollector:
+    # Sustituye al websocket en las sub-peticiones de /app/batch y acumula sus respuestas
+    def __init__(self, session):
+        self.session = session
+        self.results = []
+
+    @property
+    def failed(self):
+        return bool(self.results) and 'error' in self.results[-1]
+
+    def collect(self, response):
+        self.results.append(response)
 
 class ResponseHandler:
     async def sendResponse(self, websocket, payload, requestId):
+        if isinstance(websocket, BatchCollector):
+            session = websocket.session
+        else:
+            session = getSession(websocket)
+        if session.packedAngles:
+            payload = packPayload(payload, session.codec)
         response = {
             'request_id': requestId,
             'payload': payload
         }
-        await websocket.send(json.dumps(response))
+        if isinstance(websocket, BatchCollector):
+            websocket.collect(response)
+            return
+        await websocket.send(session.codec.encode(response))
 
     async def sendErrorResponse(self, websocket, errorMessage, requestId):
+        markRouteError()
         response = {
             'request_id': requestId,
             'error': errorMessage
         }
-        await websocket.send(json.dumps(response))
\ No newline at end of file
+        if isinstance(websocket, BatchCollector):
+            websocket.collect(response)
+            return
+        await websocket.send(getSession(websocket).codec.encode(response))
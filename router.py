@@ -0,0 +1,42 @@
+import contextvars
+import time
+from metrics import LatencyHistogram
+
+# Estadísticas de la ruta que se está atendiendo, para contar respuestas de error
+currentRouteStats = contextvars.ContextVar('currentRouteStats', default=None)
+
+def markRouteError():
+    stats = currentRouteStats.get()
+    if stats is not None:
+        stats.recordError()
+
+class Router:
+    def __init__(self):
+        self.routes = {}
+        self.stats = {}
+
+    def register(self, endpoint, method, handler):
+        # handler(payload, websocket, requestId)
+        self.routes[(endpoint, method)] = handler
+        self.stats[(endpoint, method)] = LatencyHistogram()
+
+    async def dispatch(self, endpoint, method, payload, websocket, requestId):
+        handler = self.routes.get((endpoint, method))
+        if handler is None:
+            return False
+
+        stats = self.stats[(endpoint, method)]
+        token = currentRouteStats.set(stats)
+        startTime = time.perf_counter()
+        try:
+            await handler(payload, websocket, requestId)
+        except Exception:
+            stats.recordError()
+            raise
+        finally:
+            stats.record(time.perf_counter() - startTime)
+            currentRouteStats.reset(token)
+        return True
+
+    def getStats(self):
+        return {f"{method} {endpoint}": stats.snapshot() for (endpoint, method), stats in self.stats.items()}
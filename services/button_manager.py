@@ -12,6 +12,13 @@ class ButtonManager(ResponseHandler):
         self.numButtons = 0
         self.loadConfig()
 
+    def registerRoutes(self, router):
+        router.register("/app/buttons/create", "POST", self.createButton)
+        router.register("/app/buttons/update", "POST", self.updateButtonById)
+        router.register("/app/buttons/delete", "POST", lambda payload, websocket, requestId: self.deleteButton(websocket, requestId))
+        router.register("/app/buttons/get", "GET", lambda payload, websocket, requestId: self.getButtonById(payload.get('id'), websocket, requestId))
+        router.register("/app/buttons/getAll", "GET", lambda payload, websocket, requestId: self.getAllButtons(websocket, requestId))
+
     def loadConfig(self):
         self.config.read(self.configFile)
         if 'Buttons' not in self.config:
@@ -0,0 +1,64 @@
+from response_handler import ResponseHandler
+from library_stream import iterateLibrary, takeRecords, LibraryImporter, LibraryFormatError, PAGE_SIZE
+import sqlite3
+import weakref
+
+class LibraryService(ResponseHandler):
+    # Exportación e importación de la biblioteca por trozos de registros (ver library_stream)
+    def __init__(self, dbWorker, repositoryCache):
+        self.dbWorker = dbWorker
+        self.repositoryCache = repositoryCache
+        self.imports = weakref.WeakKeyDictionary()  # Importación en curso de cada websocket
+
+    def registerRoutes(self, router):
+        router.register("/app/library/export", "GET", self.exportLibrary)
+        router.register("/app/library/import", "POST", self.importLibrary)
+
+    async def exportLibrary(self, data, websocket, requestId):
+        # Varias respuestas con el mismo request_id; la última lleva done=True.
+        # websocket.send espera al cliente, así que nunca hay más de un trozo en memoria.
+        records = iterateLibrary(self.dbWorker.db)
+        total = 0
+        while True:
+            chunk = await self.dbWorker.run(takeRecords, records, PAGE_SIZE)
+            if not chunk:
+                break
+            total += len(chunk)
+            await self.sendResponse(websocket, {"records": chunk, "done": False}, requestId)
+        await self.sendResponse(websocket, {"records": [], "done": True, "total_records": total}, requestId)
+
+    async def importLibrary(self, data, websocket, requestId):
+        # El cliente envía trozos {"records": [...], "done": bool} y espera la confirmación de cada uno;
+        # el primer trozo empieza con la cabecera de la biblioteca
+        records = data.get('records')
+        if not isinstance(records, list):
+            await self.sendErrorResponse(websocket, {"message": "records must be a list"}, requestId)
+            return
+
+        if records and isinstance(records[0], dict) and records[0].get('type') == 'library':
+            try:
+                importer = LibraryImporter(self.dbWorker.db, data.get('on_conflict', 'skip'))
+            except LibraryFormatError as e:
+                await self.sendErrorResponse(websocket, {"message": str(e)}, requestId)
+                return
+            self.imports[websocket] = importer
+        else:
+            importer = self.imports.get(websocket)
+            if importer is None:
+                await self.sendErrorResponse(websocket, {"message": "No import in progress: the first chunk must start with the library header"}, requestId)
+                return
+
+        try:
+            await self.dbWorker.run(importer.importRecords, records)
+        except (LibraryFormatError, sqlite3.Error) as e:
+            self.imports.pop(websocket, None)
+            await self.sendErrorResponse(websocket, {"message": f"Import aborted: {e}"}, requestId)
+            return
+        finally:
+            # La importación escribe directamente en la base de datos
+            self.repositoryCache.invalidateAll()
+
+        done = data.get('done') is True
+        if done:
+            self.imports.pop(websocket, None)
+        await self.sendResponse(websocket, {"done": done, **importer.getSummary()}, requestId)
@@ -0,0 +1,180 @@
+import asyncio
+import itertools
+import websockets
+from response_handler import ResponseHandler
+from repositories.cached_repository import CachedMovementRepository
+from motion_engine import MotionJob
+
+MAX_SPEED = 4.0
+TERMINAL_EVENTS = {'completed', 'cancelled', 'aborted', 'preempted'}
+EVENT_STATES = {'queued': 'queued', 'started': 'playing', 'resumed': 'playing', 'paused': 'paused'}
+
+class MotionScheduler(ResponseHandler):
+    # Cola de movimientos del motor: prioridades, cancelación, pausa, repeticiones y velocidad.
+    # Los eventos de reproducción se envían al cliente que pidió el movimiento con el request_id de /app/motion/play.
+    def __init__(self, repositoryCache, trajectoryCache):
+        self.repositoryCache = repositoryCache
+        self.movementRepository = CachedMovementRepository(repositoryCache)
+        self.trajectoryCache = trajectoryCache
+        self.engine = None
+        self.jobIds = itertools.count(1)
+        self.jobs = {}  # job_id -> estado de los trabajos en cola o en reproducción
+        self.subscribers = {}  # job_id -> (websocket, request_id)
+        self.outbox = asyncio.Queue()
+        self.deliveryTask = None
+
+    def registerRoutes(self, router):
+        router.register("/app/motion/play", "POST", self.playMovement)
+        router.register("/app/motion/cancel", "POST", self.cancelJob)
+        router.register("/app/motion/stop", "POST", lambda payload, websocket, requestId: self.stopAll(websocket, requestId))
+        router.register("/app/motion/pause", "POST", lambda payload, websocket, requestId: self.pause(websocket, requestId))
+        router.register("/app/motion/resume", "POST", lambda payload, websocket, requestId: self.resume(websocket, requestId))
+        router.register("/app/motion/speed", "POST", self.setSpeed)
+        router.register("/app/motion/status", "GET", lambda payload, websocket, requestId: self.getStatus(websocket, requestId))
+
+    def attachEngine(self, engine):
+        # Se llama desde el bucle de eventos; el motor avisa desde su hilo
+        loop = asyncio.get_running_loop()
+        self.engine = engine
+        engine.eventListener = lambda event: loop.call_soon_threadsafe(self.onEngineEvent, event)
+        self.deliveryTask = asyncio.create_task(self.deliverEvents())
+
+    async def enqueue(self, movementId, priority=0, loops=1, speed=1.0, preempt=False, subscriber=None):
+        # Trayectoria precompilada (se compila solo si no está en caché)
+        version = await self.repositoryCache.getVersion(movementId)
+        trajectory = await self.repositoryCache.dbWorker.run(self.trajectoryCache.get, movementId, version)
+        job = MotionJob(next(self.jobIds), trajectory, priority, loops, speed, preempt)
+        self.jobs[job.id] = {"job_id": job.id, "movement_id": movementId, "priority": priority, "loops": loops,
+                             "speed": speed, "state": "queued", "loop": 1, "progress": 0.0}
+        if subscriber is not None:
+            self.subscribers[job.id] = subscriber
+        self.engine.submit(job)
+        return job.id
+
+    def abortAll(self):
+        if self.engine is not None:
+            self.engine.abortAll()
+
+    def onEngineEvent(self, event):
+        job = self.jobs.get(event['job_id'])
+        if job is not None:
+            kind = event['event']
+            if kind in TERMINAL_EVENTS:
+                del self.jobs[event['job_id']]
+            else:
+                job['state'] = EVENT_STATES.get(kind, job['state'])
+                job['loop'] = event.get('loop', job['loop'])
+                job['progress'] = event.get('progress', job['progress'])
+        subscriber = self.subscribers.get(event['job_id'])
+        if event['event'] in TERMINAL_EVENTS:
+            self.subscribers.pop(event['job_id'], None)
+        if subscriber is not None:
+            self.outbox.put_nowait((subscriber, event))
+
+    async def deliverEvents(self):
+        while True:
+            (websocket, requestId), event = await self.outbox.get()
+            try:
+                await self.sendResponse(websocket, event, requestId)
+            except websockets.ConnectionClosed:
+                pass
+
+    def validateSpeed(self, speed):
+        return isinstance(speed, (int, float)) and not isinstance(speed, bool) and 0 < speed <= MAX_SPEED
+
+    async def playMovement(self, data, websocket, requestId):
+        movementId = data.get('movement_id')
+        priority = data.get('priority', 0)
+        loops = data.get('loops', 1)
+        speed = data.get('speed', 1.0)
+        preempt = data.get('preempt', False)
+
+        if self.engine is None:
+            await self.sendErrorResponse(websocket, {"message": "Motion engine is not running"}, requestId)
+            return
+
+        if not isinstance(movementId, int):
+            await self.sendErrorResponse(websocket, {"message": "Movement ID is required and must be an integer"}, requestId)
+            return
+
+        if not await self.movementRepository.findById(movementId):
+            await self.sendErrorResponse(websocket, {"message": "Movement ID does not exist"}, requestId)
+            return
+
+        if not isinstance(priority, int):
+            await self.sendErrorResponse(websocket, {"message": "priority must be an integer"}, requestId)
+            return
+
+        if not isinstance(loops, int) or loops < 0:
+            await self.sendErrorResponse(websocket, {"message": "loops must be a non-negative integer (0 repeats until stopped)"}, requestId)
+            return
+
+        if not self.validateSpeed(speed):
+            await self.sendErrorResponse(websocket, {"message": f"speed must be a number greater than 0 and up to {MAX_SPEED:g}"}, requestId)
+            return
+
+        if not isinstance(preempt, bool):
+            await self.sendErrorResponse(websocket, {"message": "preempt must be a boolean"}, requestId)
+            return
+
+        # La respuesta se envía sin ceder antes el control, así que llega antes que los eventos del trabajo
+        jobId = await self.enqueue(movementId, priority, loops, float(speed), preempt, (websocket, requestId))
+        await self.sendResponse(websocket, {"job_id": jobId, "status": "queued"}, requestId)
+
+    async def cancelJob(self, data, websocket, requestId):
+        jobId = data.get('job_id')
+        if not isinstance(jobId, int):
+            await self.sendErrorResponse(websocket, {"message": "Job ID is required and must be an integer"}, requestId)
+            return
+
+        if jobId not in self.jobs:
+            await self.sendErrorResponse(websocket, {"message": "Job ID is not queued or playing"}, requestId)
+            return
+
+        self.engine.cancel(jobId)
+        await self.sendResponse(websocket, {"job_id": jobId, "status": "cancelling"}, requestId)
+
+    async def stopAll(self, websocket, requestId):
+        self.abortAll()
+        await self.sendResponse(websocket, {"message": "Motion stopped"}, requestId)
+
+    def findJobInState(self, state):
+        return next((job for job in self.jobs.values() if job['state'] == state), None)
+
+    async def pause(self, websocket, requestId):
+        job = self.findJobInState('playing')
+        if job is None:
+            await self.sendErrorResponse(websocket, {"message": "No movement is playing"}, requestId)
+            return
+
+        self.engine.pause()
+        await self.sendResponse(websocket, {"job_id": job['job_id'], "status": "pausing"}, requestId)
+
+    async def resume(self, websocket, requestId):
+        job = self.findJobInState('paused')
+        if job is None:
+            await self.sendErrorResponse(websocket, {"message": "No movement is paused"}, requestId)
+            return
+
+        self.engine.resume()
+        await self.sendResponse(websocket, {"job_id": job['job_id'], "status": "resuming"}, requestId)
+
+    async def setSpeed(self, data, websocket, requestId):
+        speed = data.get('speed')
+        if not self.validateSpeed(speed):
+            await self.sendErrorResponse(websocket, {"message": f"speed must be a number greater than 0 and up to {MAX_SPEED:g}"}, requestId)
+            return
+
+        # Solo cambia el movimiento en curso; los encolados conservan su propia velocidad
+        job = self.findJobInState('playing') or self.findJobInState('paused')
+        if job is None:
+            await self.sendErrorResponse(websocket, {"message": "No movement is playing or paused"}, requestId)
+            return
+
+        self.engine.setSpeed(float(speed))
+        job['speed'] = float(speed)
+        await self.sendResponse(websocket, {"job_id": job['job_id'], "speed": float(speed)}, requestId)
+
+    async def getStatus(self, websocket, requestId):
+        jobs = sorted(self.jobs.values(), key=lambda job: (job['state'] == 'queued', -job['priority'], job['job_id']))
+        await self.sendResponse(websocket, {"jobs": [dict(job) for job in jobs]}, requestId)
@@ -1,11 +1,21 @@
 from response_handler import ResponseHandler
-from repositories.movement_repository import MovementRepository
+from repositories.cached_repository import CachedMovementRepository
 from dataclasses import asdict
+from models import Movement
+from pagination import parsePageRequest, buildPage, PageRequestError
 import sqlite3
 
 class MovementService(ResponseHandler):
-    def __init__(self, db):
-        self.repository = MovementRepository(db)
+    def __init__(self, repositoryCache, trajectoryCache):
+        self.repository = CachedMovementRepository(repositoryCache)
+        self.trajectoryCache = trajectoryCache
+
+    def registerRoutes(self, router):
+        router.register("/app/movements/create", "POST", self.createMovement)
+        router.register("/app/movements/update", "POST", self.updateMovementById)
+        router.register("/app/movements/delete", "POST", lambda payload, websocket, requestId: self.deleteMovementById(payload.get('id'), websocket, requestId))
+        router.register("/app/movements/get", "GET", lambda payload, websocket, requestId: self.getMovementById(payload.get('id'), websocket, requestId))
+        router.register("/app/movements/getAll", "GET", self.getAllMovements)
 
     async def createMovement(self, data, websocket, requestId):
         name = data.get('name')
@@ -14,12 +24,12 @@ class MovementService(ResponseHandler):
             await self.sendErrorResponse(websocket, {"message": "Movement name is required"}, requestId)
             return
 
-        if self.repository.findByName(name):
+        if await self.repository.findByName(name):
             await self.sendErrorResponse(websocket, {"message": "Movement with this name already exists"}, requestId)
             return
 
-        movementId = self.repository.save(name)
-        movement = self.repository.findById(movementId)
+        movementId = await self.repository.save(name)
+        movement = await self.repository.findById(movementId)
         await self.sendResponse(websocket, asdict(movement), requestId)
 
     async def updateMovementById(self, data, websocket, requestId):
@@ -33,17 +43,17 @@ class MovementService(ResponseHandler):
             await self.sendErrorResponse(websocket, {"message": "Movement name is required"}, requestId)
             return
 
-        if not self.repository.findById(movementId):
+        if not await self.repository.findById(movementId):
             await self.sendErrorResponse(websocket, {"message": "Movement ID does not exist"}, requestId)
             return
 
-        existingMovement = self.repository.findByName(name)
+        existingMovement = await self.repository.findByName(name)
         if existingMovement and existingMovement.id != movementId:
             await self.sendErrorResponse(websocket, {"message": "Movement with this name already exists"}, requestId)
             return
 
-        self.repository.updateById(movementId, name)
-        movement = self.repository.findById(movementId)
+        await self.repository.updateById(movementId, name)
+        movement = await self.repository.findById(movementId)
         await self.sendResponse(websocket, asdict(movement), requestId)
 
     async def deleteMovementById(self, movementId, websocket, requestId):
@@ -51,11 +61,12 @@ class MovementService(ResponseHandler):
             await self.sendErrorResponse(websocket, {"message": "Movement ID is required and must be an integer"}, requestId)
             return
 
-        if not self.repository.findById(movementId):
+        if not await self.repository.findById(movementId):
             await self.sendErrorResponse(websocket, {"message": "Movement ID does not exist"}, requestId)
             return
 
-        self.repository.deleteById(movementId)
+        await self.repository.deleteById(movementId)
+        self.trajectoryCache.invalidate(movementId)
         await self.sendResponse(websocket, {'id': movementId}, requestId)
 
     async def getMovementById(self, movementId, websocket, requestId):
@@ -63,16 +74,19 @@ class MovementService(ResponseHandler):
             await self.sendErrorResponse(websocket, {"message": "Movement ID is required and must be an integer"}, requestId)
             return
         
-        movement = self.repository.findById(movementId)
+        movement = await self.repository.findById(movementId)
         if movement:
             await self.sendResponse(websocket, asdict(movement), requestId)
         else:
             await self.sendErrorResponse(websocket, {"message": "Movement not found"}, requestId)
 
-    async def getAllMovements(self, websocket, requestId):
-        movements = self.repository.findAll()
-        payload = {
-            "total_items": len(movements),
-            "content": [asdict(movement) for movement in movements]
-        }
+    async def getAllMovements(self, data, websocket, requestId):
+        try:
+            limit, after, fields = parsePageRequest(data, Movement, 1)
+        except PageRequestError as e:
+            await self.sendErrorResponse(websocket, {"message": str(e)}, requestId)
+            return
+
+        movements = await self.repository.findPageAfter(after[0] if after else 0, None if limit is None else limit + 1)
+        payload = buildPage(movements, await self.repository.countAll(), limit, fields, lambda movement: (movement.id,))
         await self.sendResponse(websocket, payload, requestId)
@@ -1,17 +1,33 @@
 from response_handler import ResponseHandler
-from repositories.position_repository import PositionRepository
-from repositories.movement_repository import MovementRepository
+from repositories.cached_repository import CachedMovementRepository, CachedPositionRepository
 from dataclasses import asdict
+from interpolation import PROFILES
+from models import NUM_SERVOS, Position
+from pagination import parsePageRequest, buildPage, PageRequestError
 import sqlite3
 
 class PositionService(ResponseHandler):
-    def __init__(self, db):
-        self.repository = PositionRepository(db)
-        self.movementRepository = MovementRepository(db)
-        self.positions = []
-        self.executeMovementBoolean = False
+    def __init__(self, repositoryCache, motionScheduler):
+        self.repositoryCache = repositoryCache
+        self.repository = CachedPositionRepository(repositoryCache)
+        self.movementRepository = CachedMovementRepository(repositoryCache)
+        self.motionScheduler = motionScheduler
         self.moveToInitialPositionsBoolean = False
 
+    def registerRoutes(self, router):
+        router.register("/app/positions/create", "POST", self.createPosition)
+        router.register("/app/positions/update", "POST", self.updatePositionById)
+        router.register("/app/positions/delete", "POST", lambda payload, websocket, requestId: self.deletePositionById(payload.get('id'), websocket, requestId))
+        router.register("/app/positions/get", "GET", lambda payload, websocket, requestId: self.getPositionById(payload.get('id'), websocket, requestId))
+        router.register("/app/positions/getAll", "GET", self.getAllPositions)
+        router.register("/app/positions/getByMovementId", "GET", self.getPositionsByMovementId)
+        router.register("/app/positions/insertAt", "POST", self.insertPositionAt)
+        router.register("/app/positions/reorder", "POST", self.reorderPositions)
+        router.register("/app/positions/moveUp", "POST", lambda payload, websocket, requestId: self.movePositionUp(payload.get('id'), websocket, requestId))
+        router.register("/app/positions/moveDown", "POST", lambda payload, websocket, requestId: self.movePositionDown(payload.get('id'), websocket, requestId))
+        router.register("/app/positions/moveToInitial", "POST", lambda payload, websocket, requestId: self.moveToInitialPosition(websocket, requestId))
+        router.register("/app/positions/executeMovement", "POST", lambda payload, websocket, requestId: self.executeMovement(payload.get('movement_id'), websocket, requestId))
+
     def validateAngles(self, angles):
         if not isinstance(angles, list):
             return False
@@ -22,6 +38,8 @@ class PositionService(ResponseHandler):
                 return False
             if not isinstance(angle['id'], int) or not isinstance(angle['angle'], int):
                 return False
+            if not (1 <= angle['id'] <= NUM_SERVOS):
+                return False
             if not (0 <= angle['angle'] <= 180):
                 return False
         return True
@@ -30,53 +48,124 @@ class PositionService(ResponseHandler):
         movementId = data.get('movement_id')
         angles = data.get('angles')
         time = data.get('time')
+        profile = data.get('profile', 'linear')
 
         if not isinstance(movementId, int):
             await self.sendErrorResponse(websocket, {"message": "Movement ID is required and must be an integer"}, requestId)
             return
 
-        if not self.movementRepository.findById(movementId):
+        if not await self.movementRepository.findById(movementId):
             await self.sendErrorResponse(websocket, {"message": "Movement ID does not exist"}, requestId)
             return
 
         if not self.validateAngles(angles):
-            await self.sendErrorResponse(websocket, {"message": "Invalid angles format: angles must be a list of dictionaries with integer id and angle between 0 and 180"}, requestId)
+            await self.sendErrorResponse(websocket, {"message": "Invalid angles format: angles must be a list of dictionaries with integer id between 1 and 19 and angle between 0 and 180"}, requestId)
             return
 
         if not isinstance(time, int) or time < 0:
             await self.sendErrorResponse(websocket, {"message": "Invalid time format: time must be a non-negative integer"}, requestId)
             return
 
-        positions = self.repository.findAllByMovementId(movementId)
-        order = len(positions) + 1
+        if profile not in PROFILES:
+            await self.sendErrorResponse(websocket, {"message": "Invalid profile: must be one of " + ", ".join(PROFILES)}, requestId)
+            return
 
-        positionId = self.repository.save(order, time, angles, movementId)
-        position = self.repository.findById(positionId)
+        positionId = await self.repository.append(time, angles, movementId, profile)
+        position = await self.repository.findById(positionId)
         await self.sendResponse(websocket, asdict(position), requestId)
 
+    async def insertPositionAt(self, data, websocket, requestId):
+        movementId = data.get('movement_id')
+        order = data.get('order')
+        angles = data.get('angles')
+        time = data.get('time')
+        profile = data.get('profile', 'linear')
+
+        if not isinstance(movementId, int):
+            await self.sendErrorResponse(websocket, {"message": "Movement ID is required and must be an integer"}, requestId)
+            return
+
+        if not await self.movementRepository.findById(movementId):
+            await self.sendErrorResponse(websocket, {"message": "Movement ID does not exist"}, requestId)
+            return
+
+        if not isinstance(order, int) or order < 1:
+            await self.sendErrorResponse(websocket, {"message": "Order is required and must be a positive integer"}, requestId)
+            return
+
+        if not self.validateAngles(angles):
+            await self.sendErrorResponse(websocket, {"message": "Invalid angles format: angles must be a list of dictionaries with integer id between 1 and 19 and angle between 0 and 180"}, requestId)
+            return
+
+        if not isinstance(time, int) or time < 0:
+            await self.sendErrorResponse(websocket, {"message": "Invalid time format: time must be a non-negative integer"}, requestId)
+            return
+
+        if profile not in PROFILES:
+            await self.sendErrorResponse(websocket, {"message": "Invalid profile: must be one of " + ", ".join(PROFILES)}, requestId)
+            return
+
+        positionId = await self.repository.insertAt(order, time, angles, movementId, profile)
+        if positionId is None:
+            await self.sendErrorResponse(websocket, {"message": "Order is beyond the end of the movement"}, requestId)
+            return
+
+        position = await self.repository.findById(positionId)
+        await self.sendResponse(websocket, asdict(position), requestId)
+
+    async def reorderPositions(self, data, websocket, requestId):
+        movementId = data.get('movement_id')
+        ids = data.get('ids')
+
+        if not isinstance(movementId, int):
+            await self.sendErrorResponse(websocket, {"message": "Movement ID is required and must be an integer"}, requestId)
+            return
+
+        if not await self.movementRepository.findById(movementId):
+            await self.sendErrorResponse(websocket, {"message": "Movement ID does not exist"}, requestId)
+            return
+
+        if not isinstance(ids, list) or not all(isinstance(id, int) for id in ids):
+            await self.sendErrorResponse(websocket, {"message": "ids must be a list of position IDs"}, requestId)
+            return
+
+        if not await self.repository.reorder(movementId, ids):
+            await self.sendErrorResponse(websocket, {"message": "ids must contain every position of the movement exactly once"}, requestId)
+            return
+
+        await self.sendResponse(websocket, {'movement_id': movementId, 'status': 'reordered'}, requestId)
+
     async def updatePositionById(self, data, websocket, requestId):
         positionId = data.get('id')
         time = data.get('time')
         angles = data.get('angles')
+        profile = data.get('profile')
 
         if not isinstance(positionId, int):
             await self.sendErrorResponse(websocket, {"message": "Position ID is required and must be an integer"}, requestId)
             return
 
-        if not self.repository.findById(positionId):
+        existingPosition = await self.repository.findById(positionId)
+        if not existingPosition:
             await self.sendErrorResponse(websocket, {"message": "Position ID does not exist"}, requestId)
             return
 
         if not self.validateAngles(angles):
-            await self.sendErrorResponse(websocket, {"message": "Invalid angles format: angles must be a list of dictionaries with integer id and angle between 0 and 180"}, requestId)
+            await self.sendErrorResponse(websocket, {"message": "Invalid angles format: angles must be a list of dictionaries with integer id between 1 and 19 and angle between 0 and 180"}, requestId)
             return
 
         if not isinstance(time, int) or time < 0:
             await self.sendErrorResponse(websocket, {"message": "Invalid time format: time must be a non-negative integer"}, requestId)
             return
 
-        self.repository.updateById(positionId, time, angles)
-        position = self.repository.findById(positionId)
+        if profile is None:
+            profile = existingPosition.profile
+        elif profile not in PROFILES:
+            await self.sendErrorResponse(websocket, {"message": "Invalid profile: must be one of " + ", ".join(PROFILES)}, requestId)
+            return
+
+        await self.repository.updateById(positionId, time, angles, profile)
+        position = await self.repository.findById(positionId)
         await self.sendResponse(websocket, asdict(position), requestId)
 
     async def deletePositionById(self, positionId, websocket, requestId):
@@ -84,13 +173,12 @@ class PositionService(ResponseHandler):
             await self.sendErrorResponse(websocket, {"message": "Position ID is required and must be an integer"}, requestId)
             return
 
-        position = self.repository.findById(positionId)
+        position = await self.repository.findById(positionId)
         if not position:
             await self.sendErrorResponse(websocket, {"message": "Position ID does not exist"}, requestId)
             return
 
-        self.repository.deleteById(positionId)
-        self.repository.decrementOrder(position.order, position.movement_id)
+        await self.repository.deleteAndCompact(positionId, position.order, position.movement_id)
         await self.sendResponse(websocket, {'id': positionId}, requestId)
 
     async def getPositionById(self, positionId, websocket, requestId):
@@ -98,34 +186,43 @@ class PositionService(ResponseHandler):
             await self.sendErrorResponse(websocket, {"message": "Position ID is required and must be an integer"}, requestId)
             return
 
-        position = self.repository.findById(positionId)
+        position = await self.repository.findById(positionId)
         if position:
             await self.sendResponse(websocket, asdict(position), requestId)
         else:
             await self.sendErrorResponse(websocket, {"message": "Position not found"}, requestId)
 
-    async def getAllPositions(self, websocket, requestId):
-        positions = self.repository.findAll()
-        payload = {
-            "total_items": len(positions),
-            "content": [asdict(position) for position in positions]
-        }
+    async def getAllPositions(self, data, websocket, requestId):
+        try:
+            limit, after, fields = parsePageRequest(data, Position, 3)
+        except PageRequestError as e:
+            await self.sendErrorResponse(websocket, {"message": str(e)}, requestId)
+            return
+
+        positions = await self.repository.findPage(after, None if limit is None else limit + 1)
+        payload = buildPage(positions, await self.repository.countAll(), limit, fields,
+                            lambda position: (position.movement_id, position.order, position.id))
         await self.sendResponse(websocket, payload, requestId)
 
-    async def getPositionsByMovementId(self, movementId, websocket, requestId):
+    async def getPositionsByMovementId(self, data, websocket, requestId):
+        movementId = data.get('movement_id')
         if not isinstance(movementId, int):
             await self.sendErrorResponse(websocket, {"message": "Movement ID is required and must be an integer"}, requestId)
             return
 
-        if not self.movementRepository.findById(movementId):
+        if not await self.movementRepository.findById(movementId):
             await self.sendErrorResponse(websocket, {"message": "Movement ID does not exist"}, requestId)
             return
 
-        positions = self.repository.findAllByMovementId(movementId)
-        payload = {
-            "total_items": len(positions),
-            "content": [asdict(position) for position in positions]
-        }
+        try:
+            limit, after, fields = parsePageRequest(data, Position, 2)
+        except PageRequestError as e:
+            await self.sendErrorResponse(websocket, {"message": str(e)}, requestId)
+            return
+
+        positions = await self.repository.findPageByMovementId(movementId, after, None if limit is None else limit + 1)
+        payload = buildPage(positions, await self.repository.countByMovementId(movementId), limit, fields,
+                            lambda position: (position.order, position.id))
         await self.sendResponse(websocket, payload, requestId)
 
     async def movePositionUp(self, positionId, websocket, requestId):
@@ -133,13 +230,13 @@ class PositionService(ResponseHandler):
             await self.sendErrorResponse(websocket, {"message": "Position ID is required and must be an integer"}, requestId)
             return
 
-        position = self.repository.findById(positionId)
+        position = await self.repository.findById(positionId)
         if not position:
             await self.sendErrorResponse(websocket, {"message": "Position ID does not exist"}, requestId)
             return
 
         if position.order > 1:  # Verificar si no es la primera posición
-            self.repository.swapWithPrevious(position.id, position.order, position.movement_id)
+            await self.repository.swapWithPrevious(position.id, position.order, position.movement_id)
             await self.sendResponse(websocket, {'id': positionId, 'status': 'moved up'}, requestId)
         else:
             await self.sendErrorResponse(websocket, {"message": "Position is already at the top"}, requestId)
@@ -149,14 +246,14 @@ class PositionService(ResponseHandler):
             await self.sendErrorResponse(websocket, {"message": "Position ID is required and must be an integer"}, requestId)
             return
 
-        position = self.repository.findById(positionId)
+        position = await self.repository.findById(positionId)
         if not position:
             await self.sendErrorResponse(websocket, {"message": "Position ID does not exist"}, requestId)
             return
 
-        max_order = self.repository.findMaxOrder(position.movement_id)  # Obtener el orden máximo
+        max_order = await self.repository.findMaxOrder(position.movement_id)  # Obtener el orden máximo
         if position.order < max_order:  # Verificar si no es la última posición
-            self.repository.swapWithNext(position.id, position.order, position.movement_id)
+            await self.repository.swapWithNext(position.id, position.order, position.movement_id)
             await self.sendResponse(websocket, {'id': positionId, 'status': 'moved down'}, requestId)
         else:
             await self.sendErrorResponse(websocket, {"message": "Position is already at the bottom"}, requestId)
@@ -170,11 +267,14 @@ class PositionService(ResponseHandler):
             await self.sendErrorResponse(websocket, {"message": "Movement ID is required and must be an integer"}, requestId)
             return
 
-        if not self.movementRepository.findById(movementId):
+        if not await self.movementRepository.findById(movementId):
             await self.sendErrorResponse(websocket, {"message": "Movement ID does not exist"}, requestId)
             return
 
-        self.positions = self.repository.findAllByMovementId(movementId)  # position ya ordenado por order
-        self.executeMovementBoolean = True
+        if self.motionScheduler.engine is None:
+            await self.sendErrorResponse(websocket, {"message": "Motion engine is not running"}, requestId)
+            return
 
-        await self.sendResponse(websocket, {"message": "Movement executed"}, requestId)
+        # Se encola detrás de los movimientos pendientes (ver /app/motion/play para prioridades y repeticiones)
+        jobId = await self.motionScheduler.enqueue(movementId)
+        await self.sendResponse(websocket, {"message": "Movement executed", "job_id": jobId}, requestId)
@@ -5,6 +5,12 @@ from response_handler import ResponseHandler
 import configparser
 import time
 import asyncio
+from metrics import registry
+
+# Tipos de frame binario del canal de control en vivo
+LIVE_PAIRS = 0x01  # 0x01 seguido de pares (id, ángulo) de un byte cada uno
+LIVE_FRAME = 0x02  # 0x02 seguido de un ángulo por servo en orden de id; 0xFF = sin cambio
+LIVE_UNCHANGED = 0xFF
 
 class ServoManager(ResponseHandler):
     def __init__(self, configFile='config.ini'):
@@ -12,7 +18,21 @@ class ServoManager(ResponseHandler):
         self.config = configparser.ConfigParser()
         self.servos = []
         self.numServos = 0
+        # Último ángulo recibido por servo entre dos ticks del bucle de control
+        self.stagedAngles = {}
+        self.liveFramesAccepted = 0  # Frames que dejaron al menos un ángulo preparado
+        self.liveFramesRejected = 0
+        self.liveValuesRejected = 0  # Pares con id de servo o ángulo fuera de rango
         self.loadConfig()
+        registry.gauge('servo.live_frames', self.getLiveFrameStats)
+
+    def registerRoutes(self, router):
+        router.register("/app/servos/create", "POST", self.createServo)
+        router.register("/app/servos/update", "POST", self.updateServoById)
+        router.register("/app/servos/delete", "POST", lambda payload, websocket, requestId: self.deleteServo(websocket, requestId))
+        router.register("/app/servos/get", "GET", lambda payload, websocket, requestId: self.getServoById(payload.get('id'), websocket, requestId))
+        router.register("/app/servos/getAll", "GET", lambda payload, websocket, requestId: self.getAllServos(websocket, requestId))
+        router.register("/app/servos/savePosition", "POST", lambda payload, websocket, requestId: self.savePosition(websocket, requestId))
 
     def loadConfig(self):
         self.config.read(self.configFile)
@@ -102,3 +122,42 @@ class ServoManager(ResponseHandler):
             "content": [asdict(servo) for servo in self.servos]
         }
         await self.sendResponse(websocket, payload, requestId)
+
+    def stageLiveFrame(self, message):
+        # Frames binarios sin respuesta: solo se guarda el valor más reciente de cada servo
+        if len(message) < 2:
+            self.liveFramesRejected += 1
+            return
+        kind = message[0]
+        body = message[1:]
+        if kind == LIVE_PAIRS and len(body) % 2 == 0:
+            updates = zip(body[0::2], body[1::2])
+        elif kind == LIVE_FRAME and len(body) <= self.numServos:
+            updates = ((servoId, angle) for servoId, angle in enumerate(body, start=1) if angle != LIVE_UNCHANGED)
+        else:
+            self.liveFramesRejected += 1
+            return
+
+        staged = 0
+        for servoId, angle in updates:
+            if 1 <= servoId <= self.numServos and angle <= 180:
+                self.stagedAngles[servoId] = angle
+                staged += 1
+            else:
+                self.liveValuesRejected += 1
+        if staged:
+            self.liveFramesAccepted += 1
+        else:
+            self.liveFramesRejected += 1
+
+    def getLiveFrameStats(self):
+        return {"accepted": self.liveFramesAccepted, "rejected": self.liveFramesRejected,
+                "values_rejected": self.liveValuesRejected}
+
+    def applyStagedAngles(self):
+        if not self.stagedAngles:
+            return
+        stagedAngles, self.stagedAngles = self.stagedAngles, {}
+        for servo in self.servos:
+            if servo.id in stagedAngles:
+                servo.angle = stagedAngles[servo.id]
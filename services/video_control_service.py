@@ -1,55 +1,256 @@
 import asyncio
-import subprocess
+import configparser
+import shlex
+import time
 import websockets
+from metrics import registry
+from mjpeg_parser import MjpegFrameParser
+from response_handler import ResponseHandler
+from services.video_quality_controller import VideoQualityController, OPERATING_POINTS, DEFAULT_OPERATING_POINT
+
+# Los campos {width}, {height}, {framerate} y {quality} se rellenan con el punto de operación actual
+DEFAULT_CAMERA_COMMAND = ('libcamera-vid --inline -t 0 --framerate {framerate} '
+                          '--width {width} --height {height} --quality {quality} --codec mjpeg -o -')
+READ_SIZE = 65536
+LATENCY_SMOOTHING = 0.2
+STOP_TIMEOUT = 2.0  # Segundos de espera a que la cámara termine tras terminate() antes de kill()
+VIDEO_LIMITS = {"width": (64, 1920), "height": (48, 1080), "framerate": (1, 60), "quality": (1, 100)}
+
+def isIntegerValue(value):
+    # bool es subclase de int: true/false no son valores válidos
+    return isinstance(value, int) and not isinstance(value, bool)
+
+class VideoClient:
+    # Un hueco de salida por cliente: siempre contiene el frame más reciente y descarta los antiguos
+    def __init__(self, websocket):
+        self.websocket = websocket
+        self.pendingFrame = None
+        self.frameReady = asyncio.Event()
+        self.framesSent = 0
+        self.framesDropped = 0
+        self.bytesSent = 0
+        self.latency = 0.0  # Media móvil de captura -> envío completado, en segundos
+        self.sendLatency = registry.histogram('video.send_latency')
+        self.senderTask = None
+
+    def start(self):
+        self.senderTask = asyncio.create_task(self.sendLoop())
+
+    def stop(self):
+        if self.senderTask:
+            self.senderTask.cancel()
+            self.senderTask = None
+
+    def offer(self, frame, capturedAt):
+        if self.pendingFrame is not None:
+            self.framesDropped += 1
+            registry.increment('video.frames_dropped')
+        self.pendingFrame = (frame, capturedAt)
+        self.frameReady.set()
+
+    async def sendLoop(self):
+        try:
+            while True:
+                await self.frameReady.wait()
+                self.frameReady.clear()
+                (frame, capturedAt), self.pendingFrame = self.pendingFrame, None
+                sendStart = time.perf_counter()
+                await self.websocket.send(frame)
+                sendEnd = time.perf_counter()
+                self.sendLatency.record(sendEnd - sendStart)
+                self.latency += LATENCY_SMOOTHING * (sendEnd - capturedAt - self.latency)
+                self.framesSent += 1
+                self.bytesSent += len(frame)
+                registry.increment('video.frames_sent')
+                registry.increment('video.bytes_sent', len(frame))
+        except websockets.ConnectionClosed:
+            pass
+
+    def getStats(self):
+        return {"sent": self.framesSent, "dropped": self.framesDropped, "bytes_sent": self.bytesSent,
+                "latency_ms": round(self.latency * 1000, 1)}
+
+class VideoControlService(ResponseHandler):
+    def __init__(self, configFile='config.ini'):
+        self.configFile = configFile
+        self.config = configparser.ConfigParser()
+        self.config.read(self.configFile)
+        # Comando de captura configurable, p. ej. `python tools/fake_camera.py` para pruebas sin cámara
+        self.command = DEFAULT_CAMERA_COMMAND
+        section = self.config['Video'] if 'Video' in self.config else {}
+        if section.get('command'):
+            self.command = section['command']
+        self.mode = section.get('mode', 'manual')
+        self.operatingPointIndex = DEFAULT_OPERATING_POINT
+        self.operatingPoint = dict(OPERATING_POINTS[self.operatingPointIndex])
+        self.qualityController = VideoQualityController(self, int(section.get('target_latency_ms', '200')) / 1000)
+        self.controllerTask = None
 
-class VideoControlService:
-    def __init__(self):
         self.clients = set()
         self.process = None
         self.streamingTask = None
+        # Arranque, parada y reconfiguración de la captura en serie: un stop durante un reinicio gana
+        self.captureLock = asyncio.Lock()
+        registry.gauge('video.clients', lambda: len(self.clients))
+        registry.gauge('video.client_stats', lambda: [client.getStats() for client in self.clients])
+
+    def registerRoutes(self, router):
+        router.register("/app/video/start", "POST", lambda payload, websocket, requestId: self.startVideoStream())
+        router.register("/app/video/stop", "POST", lambda payload, websocket, requestId: self.stopVideo())
+        router.register("/app/video/config", "GET", lambda payload, websocket, requestId: self.getVideoConfig(websocket, requestId))
+        router.register("/app/video/config", "POST", self.updateVideoConfig)
+
+    def getConfigPayload(self):
+        return {
+            "mode": self.mode,
+            "target_latency_ms": round(self.qualityController.targetLatency * 1000),
+            "level": self.operatingPointIndex,
+            "levels": OPERATING_POINTS,
+            **self.operatingPoint,
+            "streaming": self.streamingTask is not None,
+            "clients": [client.getStats() for client in self.clients],
+        }
+
+    async def getVideoConfig(self, websocket, requestId):
+        await self.sendResponse(websocket, self.getConfigPayload(), requestId)
+
+    async def updateVideoConfig(self, data, websocket, requestId):
+        mode = data.get('mode', self.mode)
+        if mode not in ('auto', 'manual'):
+            await self.sendErrorResponse(websocket, {"message": "mode must be 'auto' or 'manual'"}, requestId)
+            return
+
+        targetLatency = data.get('target_latency_ms')
+        if targetLatency is not None and (not isIntegerValue(targetLatency) or targetLatency <= 0):
+            await self.sendErrorResponse(websocket, {"message": "target_latency_ms must be a positive integer"}, requestId)
+            return
+
+        level = data.get('level')
+        if level is not None and (not isIntegerValue(level) or not 0 <= level < len(OPERATING_POINTS)):
+            await self.sendErrorResponse(websocket, {"message": f"level must be an integer between 0 and {len(OPERATING_POINTS) - 1}"}, requestId)
+            return
+
+        operatingPoint = dict(OPERATING_POINTS[level]) if level is not None else dict(self.operatingPoint)
+        for key, (low, high) in VIDEO_LIMITS.items():
+            if key in data:
+                if not isIntegerValue(data[key]) or not low <= data[key] <= high:
+                    await self.sendErrorResponse(websocket, {"message": f"{key} must be an integer between {low} and {high}"}, requestId)
+                    return
+                operatingPoint[key] = data[key]
+
+        self.mode = mode
+        if targetLatency is not None:
+            self.qualityController.targetLatency = targetLatency / 1000
+        if operatingPoint != self.operatingPoint:
+            await self.applyOperatingPoint(level if level is not None else operatingPoint)
+        await self.sendResponse(websocket, self.getConfigPayload(), requestId)
+
+    async def applyOperatingPoint(self, operatingPoint):
+        # Acepta un nivel de OPERATING_POINTS o un punto de operación personalizado
+        async with self.captureLock:
+            if isinstance(operatingPoint, int):
+                self.operatingPointIndex = operatingPoint
+                self.operatingPoint = dict(OPERATING_POINTS[operatingPoint])
+            else:
+                self.operatingPoint = dict(operatingPoint)
+                self.operatingPointIndex = self.nearestLevel(operatingPoint)
+            registry.increment('video.reconfigurations')
+            if self.streamingTask:
+                # La cámara no admite cambios en caliente: se reinicia la captura conservando los clientes
+                # La cámara debe quedar libre antes de lanzar el nuevo proceso
+                await self.stopCapture()
+                await self.startCapture()
+
+    def nearestLevel(self, operatingPoint):
+        cost = operatingPoint["width"] * operatingPoint["height"] * operatingPoint["framerate"]
+        costs = [point["width"] * point["height"] * point["framerate"] for point in OPERATING_POINTS]
+        return min(range(len(costs)), key=lambda index: abs(costs[index] - cost))
+
+    async def stopVideo(self):
+        await self.stopVideoStream()
 
     async def register(self, websocket):
-        self.clients.add(websocket)
+        client = VideoClient(websocket)
+        self.clients.add(client)
+        client.start()
         try:
             await websocket.wait_closed()
         finally:
-            self.clients.remove(websocket)
+            self.clients.remove(client)
+            client.stop()
 
-    async def captureAndStream(self):
-        if self.process is None:
-            self.process = subprocess.Popen(
-                ['libcamera-vid', '--inline', '-t', '0', '--framerate', '20', 
-                '--width', '640', '--height', '480', '--codec', 'mjpeg', '-o', '-'],
-                stdout=subprocess.PIPE, stderr=subprocess.PIPE
-            )
+    async def startCapture(self):
+        # Con captureLock tomado: el proceso se lanza aquí para que una parada siempre lo encuentre
+        self.process = await asyncio.create_subprocess_exec(
+            *shlex.split(self.command.format(**self.operatingPoint)),
+            stdout=asyncio.subprocess.PIPE, stderr=asyncio.subprocess.DEVNULL
+        )
+        self.streamingTask = asyncio.create_task(self.captureAndStream(self.process))
 
+    async def captureAndStream(self, process):
+        parser = MjpegFrameParser()
         try:
+            # Lectura no bloqueante al ritmo de la cámara; cada mensaje es un JPEG completo
             while True:
-                data = self.process.stdout.read(12000)
+                data = await process.stdout.read(READ_SIZE)
                 if not data:
                     break
-                if self.clients:
-                    await asyncio.gather(*(client.send(data) for client in self.clients))
-                await asyncio.sleep(1 / 20)  # Ajusta la tasa de frames aquí
-        except websockets.ConnectionClosed:
-            print("Conexión cerrada")
+                capturedAt = time.perf_counter()
+                for frame in parser.feed(data):
+                    registry.increment('video.frames_captured')
+                    # Entregar sin esperar: un cliente lento solo pierde sus propios frames
+                    for client in self.clients:
+                        client.offer(frame, capturedAt)
         finally:
-            self.stopVideoStream()
+            registry.increment('video.bytes_discarded', parser.discardedBytes)
+            # Si la captura terminó sola (EOF o error) se libera su proceso; si fue cancelada lo detiene quien la canceló
+            if self.streamingTask is asyncio.current_task():
+                print("La captura de video terminó")
+                self.streamingTask = None
+                self.process = None
+                await self.releaseProcess(process)
 
     async def startVideoStream(self):
-        if self.process:
-            print("La captura de video ya está en funcionamiento.")
-            return
-        print("Iniciando captura de video")
-        self.streamingTask = asyncio.create_task(self.captureAndStream())
+        async with self.captureLock:
+            if self.streamingTask:
+                print("La captura de video ya está en funcionamiento.")
+                return
+            print("Iniciando captura de video")
+            await self.startCapture()
+        if self.controllerTask is None:
+            self.controllerTask = asyncio.create_task(self.qualityController.run())
 
-    def stopVideoStream(self):
-        if not self.process:
-            print("La captura de video ya está detenida.")
-            return
-        print("Deteniendo la transmisión de video")
-        self.process.terminate()
-        self.process = None
-        if self.streamingTask:
-            self.streamingTask.cancel()
-            self.streamingTask = None
+    async def stopVideoStream(self):
+        async with self.captureLock:
+            if not self.process and not self.streamingTask:
+                print("La captura de video ya está detenida.")
+                return
+            print("Deteniendo la transmisión de video")
+            await self.stopCapture()
+
+    async def stopCapture(self):
+        # Con captureLock tomado
+        process, self.process = self.process, None
+        task, self.streamingTask = self.streamingTask, None
+        if task:
+            task.cancel()
+            await asyncio.wait([task])  # Su lectura pendiente de stdout debe terminar antes de vaciarlo
+        if process:
+            await self.releaseProcess(process)
+
+    async def releaseProcess(self, process):
+        if process.returncode is None:
+            process.terminate()
+            try:
+                await asyncio.wait_for(self.waitForExit(process), STOP_TIMEOUT)
+            except asyncio.TimeoutError:
+                print("La cámara no terminó a tiempo; se fuerza su cierre")
+                process.kill()
+                await self.waitForExit(process)
+
+    async def waitForExit(self, process):
+        # Se descarta la salida pendiente: con el pipe lleno wait() no vuelve
+        async def discardOutput():
+            while await process.stdout.read(READ_SIZE):
+                pass
+        await asyncio.gather(discardOutput(), process.wait())
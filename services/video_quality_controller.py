@@ -0,0 +1,89 @@
+import asyncio
+
+# Puntos de operación de menor a mayor coste de ancho de banda
+OPERATING_POINTS = [
+    {"width": 320, "height": 240, "framerate": 10, "quality": 50},
+    {"width": 320, "height": 240, "framerate": 15, "quality": 60},
+    {"width": 640, "height": 480, "framerate": 15, "quality": 70},
+    {"width": 640, "height": 480, "framerate": 20, "quality": 80},
+    {"width": 800, "height": 600, "framerate": 25, "quality": 85},
+    {"width": 1280, "height": 720, "framerate": 30, "quality": 85},
+]
+DEFAULT_OPERATING_POINT = 3  # 640x480 a 20 fps, la configuración histórica
+
+EVALUATION_INTERVAL = 1.0
+MAX_DROP_RATIO = 0.2  # Por encima: la red no da abasto
+HEALTHY_DROP_RATIO = 0.02
+DOWNGRADE_AFTER = 2  # Intervalos malos consecutivos antes de bajar
+UPGRADE_AFTER = 5  # Intervalos holgados consecutivos antes de subir
+COOLDOWN = 3  # Intervalos ignorados tras reiniciar la captura
+
+class VideoQualityController:
+    # Modo automático: ajusta el punto de operación según la latencia y los descartes medidos por cliente,
+    # con histéresis para no reiniciar la cámara continuamente
+    def __init__(self, videoService, targetLatency):
+        self.videoService = videoService
+        self.targetLatency = targetLatency
+        self.badIntervals = 0
+        self.goodIntervals = 0
+        self.cooldown = 0
+        self.lastCounters = {}
+
+    def measure(self):
+        # Peor cliente del intervalo: latencia media y fracción de frames descartados
+        worstLatency = 0.0
+        worstDropRatio = 0.0
+        counters = {}
+        for client in self.videoService.clients:
+            sent, dropped = client.framesSent, client.framesDropped
+            lastSent, lastDropped = self.lastCounters.get(client, (sent, dropped))
+            counters[client] = (sent, dropped)
+            offered = (sent - lastSent) + (dropped - lastDropped)
+            if offered:
+                worstDropRatio = max(worstDropRatio, (dropped - lastDropped) / offered)
+            worstLatency = max(worstLatency, client.latency)
+        self.lastCounters = counters
+        return worstLatency, worstDropRatio
+
+    def evaluate(self, latency, dropRatio):
+        # Devuelve -1 para bajar de nivel, +1 para subir o 0 para mantener
+        if self.cooldown > 0:
+            self.cooldown -= 1
+            return 0
+        if latency > self.targetLatency or dropRatio > MAX_DROP_RATIO:
+            self.badIntervals += 1
+            self.goodIntervals = 0
+        elif latency < self.targetLatency / 2 and dropRatio < HEALTHY_DROP_RATIO:
+            self.goodIntervals += 1
+            self.badIntervals = 0
+        else:
+            self.badIntervals = 0
+            self.goodIntervals = 0
+
+        if self.badIntervals >= DOWNGRADE_AFTER:
+            return self.step(-1)
+        if self.goodIntervals >= UPGRADE_AFTER:
+            return self.step(+1)
+        return 0
+
+    def step(self, direction):
+        self.badIntervals = 0
+        self.goodIntervals = 0
+        level = self.videoService.operatingPointIndex + direction
+        if not 0 <= level < len(OPERATING_POINTS):
+            return 0
+        self.cooldown = COOLDOWN
+        return direction
+
+    async def run(self):
+        while True:
+            await asyncio.sleep(EVALUATION_INTERVAL)
+            if self.videoService.mode != 'auto' or not self.videoService.clients or not self.videoService.streamingTask:
+                self.lastCounters = {}
+                continue
+            latency, dropRatio = self.measure()
+            direction = self.evaluate(latency, dropRatio)
+            if direction:
+                level = self.videoService.operatingPointIndex + direction
+                print("Ajuste automático de video:", OPERATING_POINTS[level], "latencia", round(latency * 1000), "ms")
+                await self.videoService.applyOperatingPoint(level)
@@ -1,34 +1,102 @@
-from adafruit_servokit import ServoKit
-import board
-import busio
-import RPi.GPIO as GPIO  # Importar la librería GPIO para los pines de la Raspberry Pi
+import configparser
+import numpy as np
+import time
+from metrics import registry
+from backends.servo_backend import createServoBackend
 
 class ServoMotor:
-    def __init__(self):
-        # Configuración del bus I2C
-        self.i2c_bus = busio.I2C(board.SCL, board.SDA)
+    def __init__(self, configFile='config.ini'):
+        self.configFile = configFile
+        self.config = configparser.ConfigParser()
+        self.config.read(self.configFile)
 
-        # Inicializar el PCA9685
-        self.kit = ServoKit(channels=16, i2c=self.i2c_bus)
+        # Driver de salida seleccionado en config.ini (hardware o simulado)
+        self.backend = createServoBackend(self.config)
+        self.numPwmChannels = self.backend.numPwmChannels
+        self.numChannels = self.numPwmChannels + self.backend.numGpioChannels
 
         # Configuración del rango de ángulos del servo
-        for servo_channel in range(16):
-            self.kit.servo[servo_channel].set_pulse_width_range(500, 2500)  # Ajusta estos valores si es necesario
+        self.minPulse = 500
+        self.maxPulse = 2500  # Ajusta estos valores si es necesario
 
-        # Inicializar servos controlados por pines de la Raspberry Pi
-        self.rpi_servos = [12, 13, 18]  # Pines GPIO utilizados
-        GPIO.setmode(GPIO.BCM)
-        for pin in self.rpi_servos:
-            GPIO.setup(pin, GPIO.OUT)
-            GPIO.PWM(pin, 50).start(0)  # Iniciar PWM a 50Hz
+        # Registro sombra: último valor escrito en cada canal (cuentas del PCA9685, -1 si nunca se escribió,
+        # o ciclo de trabajo GPIO)
+        self.shadowCounts = np.full(self.numPwmChannels, -1, dtype=np.int32)
+        self.shadow = [None] * self.numChannels
+        self.writtenCount = 0
+        self.skippedCount = 0
+        self.burstCount = 0
+
+        self.pwmWriteLatency = registry.histogram('servo.pwm_write_latency')
+        self.gpioWriteLatency = registry.histogram('servo.gpio_write_latency')
+        registry.gauge('servo.writes', self.getWriteStats)
+        if hasattr(self.backend, 'getStats'):
+            # Backend simulado: intervalos y jitter de las escrituras registradas
+            registry.gauge('servo.simulated_backend', self.backend.getStats)
+
+    def close(self):
+        self.backend.close()
 
     def setServoAngle(self, index, angle):
-        if 0 <= index < 16:
-            self.kit.servo[index].angle = angle
-        elif 16 <= index < 19:
-            dutyCycle = self.mapAngleToDutyCycle(angle)
-            GPIO.PWM(self.rpi_servos[index - 16], 50).ChangeDutyCycle(dutyCycle)
-    
-    def mapAngleToDutyCycle(self, angle):
-        return 2.5 + (12.0 - 2.5) * angle / 180
+        if not 0 <= index < self.numChannels:
+            return
+        frame = [None] * self.numChannels
+        frame[index] = angle
+        self.writeFrame(frame)
+
+    def setServoAngles(self, angles):
+        frame = [None] * self.numChannels
+        for index, angle in angles.items():
+            if 0 <= index < self.numChannels:
+                frame[index] = angle
+        self.writeFrame(frame)
+
+    def writeFrame(self, angles):
+        # angles: secuencia indexada por canal; None/NaN deja el canal sin tocar
+        frame = np.asarray(angles, dtype=float)
+        pwmAngles = frame[:self.numPwmChannels]
+        valid = ~np.isnan(pwmAngles)
+        counts = self.mapAnglesToCounts(pwmAngles)
+        dirty = valid & (counts != self.shadowCounts[:len(counts)])
+        skipped = int(np.count_nonzero(valid)) - int(np.count_nonzero(dirty))
+
+        if dirty.any():
+            # Todos los canales modificados viajan en una sola transacción I2C
+            dirtyIndices = np.flatnonzero(dirty)
+            firstDirty = int(dirtyIndices[0])
+            lastDirty = int(dirtyIndices[-1])
+            self.shadowCounts[dirtyIndices] = counts[dirtyIndices]
+            span = np.maximum(self.shadowCounts[firstDirty:lastDirty + 1], 0)
+            writeStart = time.perf_counter()
+            self.backend.writePwmCounts(firstDirty, span.tolist())
+            self.pwmWriteLatency.record(time.perf_counter() - writeStart)
+            self.writtenCount += len(span)
+            self.burstCount += 1
 
+        for index in range(self.numPwmChannels, min(self.numChannels, len(frame))):
+            angle = frame[index]
+            if np.isnan(angle):
+                continue
+            dutyCycle = self.mapAngleToDutyCycle(float(angle))
+            if self.shadow[index] == dutyCycle:
+                skipped += 1
+                continue
+            writeStart = time.perf_counter()
+            self.backend.writeDutyCycle(index - self.numPwmChannels, dutyCycle)
+            self.gpioWriteLatency.record(time.perf_counter() - writeStart)
+            self.shadow[index] = dutyCycle
+            self.writtenCount += 1
+
+        self.skippedCount += skipped
+
+    def getWriteStats(self):
+        return {"written": self.writtenCount, "skipped": self.skippedCount, "bursts": self.burstCount}
+
+    def mapAnglesToCounts(self, angles):
+        angles = np.clip(np.nan_to_num(angles), 0, 180)
+        pulses = self.minPulse + (self.maxPulse - self.minPulse) * angles / 180
+        return np.minimum(4095, np.rint(pulses * self.backend.pwmFrequency * 4096 / 1000000)).astype(np.int32)
+
+    def mapAngleToDutyCycle(self, angle):
+        # Redondeo a la resolución útil del PWM para que ángulos equivalentes no generen escrituras
+        return round(2.5 + (12.0 - 2.5) * angle / 180, 2)
@@ -0,0 +1,92 @@
+import asyncio
+import configparser
+import time
+from metrics import registry
+
+DEFAULT_RATE_HZ = 100
+SKIP = 'skip'  # Tras un retraso se saltan los ticks vencidos
+CATCH_UP = 'catchup'  # Tras un retraso se ejecutan seguidos los ticks vencidos (hasta MAX_CATCH_UP)
+OVERRUN_POLICIES = (SKIP, CATCH_UP)
+MAX_CATCH_UP = 5  # Con más ticks de retraso se saltan aunque la política sea catchup
+OVERSLEEP_STEP = 1e-5  # Ajuste por tick de la estimación de lo que se pasa de largo sleep()
+
+def loadControlConfig(configFile='config.ini'):
+    # Devuelve (periodo en segundos, política de retraso) de la sección [Control]
+    config = configparser.ConfigParser()
+    config.read(configFile)
+    section = config['Control'] if 'Control' in config else {}
+    rate = float(section.get('rate_hz', str(DEFAULT_RATE_HZ)))
+    overrun = section.get('overrun', SKIP)
+    if rate <= 0:
+        raise ValueError("[Control] rate_hz must be positive")
+    if overrun not in OVERRUN_POLICIES:
+        raise ValueError("[Control] overrun must be one of " + ", ".join(OVERRUN_POLICIES))
+    return 1.0 / rate, overrun
+
+class TickScheduler:
+    # Ticks en deadlines absolutos (origen + n·periodo): el retraso de un tick no se acumula en los
+    # siguientes. La espera es un sleep, no un bucle activo; se adelanta la mediana de lo que el
+    # sistema se pasa de largo al despertar, así que no hace falta apurar la espera girando.
+    def __init__(self, period, name, overrun=SKIP):
+        self.period = period
+        self.overrun = overrun
+        self.origin = None
+        self.tick = 0
+        self.oversleep = 0.0
+        self.drift = 0.0  # Adelanto (-) o retraso (+) del último tick respecto a su deadline
+        self.lastTickTime = None
+        self.missedName = f'{name}.missed_deadlines'
+        self.tickPeriod = registry.histogram(f'{name}.tick_period')
+        self.tickLateness = registry.histogram(f'{name}.tick_lateness')
+        registry.gauge(f'{name}.tick_drift_ms', lambda: round(self.drift * 1000, 3))
+
+    def reset(self):
+        # Nuevo origen: el primer tick será un periodo después de ahora
+        self.origin = time.monotonic()
+        self.tick = 0
+        self.lastTickTime = None
+
+    @property
+    def nextDeadline(self):
+        return self.origin + (self.tick + 1) * self.period
+
+    def wait(self):
+        # Versión para hilos (motor de movimiento); devuelve cuántos ticks se saltaron
+        if self.origin is None:
+            self.reset()
+        deadline = self.nextDeadline
+        remaining = deadline - time.monotonic() - self.oversleep
+        if remaining > 0:
+            time.sleep(remaining)
+        return self.completeTick(deadline, remaining > 0)
+
+    async def waitAsync(self):
+        # Versión para el bucle de eventos (el selector redondea sus esperas al milisegundo)
+        if self.origin is None:
+            self.reset()
+        deadline = self.nextDeadline
+        remaining = deadline - time.monotonic() - self.oversleep
+        if remaining > 0:
+            await asyncio.sleep(remaining)
+        return self.completeTick(deadline, remaining > 0)
+
+    def completeTick(self, deadline, slept):
+        now = time.monotonic()
+        lateness = now - deadline
+        if slept:
+            # Estimación de la mediana por pasos fijos: un despertar muy tardío (tick perdido) no la dispara
+            step = OVERSLEEP_STEP if lateness > 0 else -OVERSLEEP_STEP
+            self.oversleep = min(self.period / 2, max(0.0, self.oversleep + step))
+        self.drift = lateness
+        self.tickLateness.record(max(0.0, lateness))
+        if self.lastTickTime is not None:
+            self.tickPeriod.record(now - self.lastTickTime)
+        self.lastTickTime = now
+
+        self.tick += 1
+        missed = int(lateness / self.period) if lateness > 0 else 0
+        if missed > 0 and (self.overrun == SKIP or missed > MAX_CATCH_UP):
+            registry.increment(self.missedName, missed)
+            self.tick += missed
+            return missed
+        return 0
@@ -0,0 +1,103 @@
+import argparse
+import json
+import os
+import sqlite3
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+from database import Database
+from models import NUM_SERVOS, Position
+from repositories.position_repository import PositionRepository
+
+# Compara el esquema original (journal por defecto, sin índices, ángulos en JSON) con el esquema migrado,
+# usando las mismas consultas que los repositorios
+
+class LegacyDatabase:
+    # Reproduce el Database anterior a las migraciones
+    def __init__(self, dbName):
+        self.conn = sqlite3.connect(dbName)
+        self.conn.execute('''CREATE TABLE IF NOT EXISTS movements (
+                                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                                name TEXT NOT NULL UNIQUE
+                            )''')
+        self.conn.execute('''CREATE TABLE IF NOT EXISTS positions (
+                                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                                "order" INTEGER,
+                                time INTEGER,
+                                angles TEXT NOT NULL,
+                                movement_id INTEGER,
+                                profile TEXT NOT NULL DEFAULT 'linear',
+                                FOREIGN KEY (movement_id) REFERENCES movements(id)
+                            )''')
+        self.conn.commit()
+
+    def commit(self):
+        self.conn.commit()
+
+class LegacyPositionRepository(PositionRepository):
+    # Ángulos guardados como texto JSON
+    def encodeAngles(self, angles):
+        return json.dumps(angles)
+
+    def rowToPosition(self, row):
+        return Position(id=row[0], order=row[1], time=row[2], angles=json.loads(row[3]), movement_id=row[4], profile=row[5])
+
+def populate(db, repository, movements, positionsPerMovement):
+    angles = [{"id": index + 1, "angle": 90} for index in range(NUM_SERVOS)]
+    encodedAngles = repository.encodeAngles(angles)
+    for movementIndex in range(movements):
+        movementId = db.conn.execute('INSERT INTO movements (name) VALUES (?)', (f"movement{movementIndex}",)).lastrowid
+        db.conn.executemany(
+            'INSERT INTO positions ("order", time, angles, movement_id) VALUES (?, ?, ?, ?)',
+            [(order, 100, encodedAngles, movementId) for order in range(1, positionsPerMovement + 1)]
+        )
+    db.conn.commit()
+
+def timeIt(function, repeat):
+    startTime = time.perf_counter()
+    for iteration in range(repeat):
+        function(iteration)
+    return (time.perf_counter() - startTime) / repeat * 1000
+
+def runBenchmark(repository, movements, positionsPerMovement, repeat):
+    angles = [{"id": index + 1, "angle": 45} for index in range(NUM_SERVOS)]
+    middle = positionsPerMovement // 2
+    movementOf = lambda iteration: iteration % movements + 1
+    positionId = lambda iteration: (movementOf(iteration) - 1) * positionsPerMovement + middle
+
+    return {
+        "findAllByMovementId": timeIt(lambda i: repository.findAllByMovementId(movementOf(i)), repeat),
+        "findMaxOrder": timeIt(lambda i: repository.findMaxOrder(movementOf(i)), repeat),
+        "swapWithPrevious": timeIt(lambda i: repository.swapWithPrevious(positionId(i), middle, movementOf(i)), repeat),
+        "swapWithNext": timeIt(lambda i: repository.swapWithNext(positionId(i), middle - 1, movementOf(i)), repeat),
+        "save": timeIt(lambda i: repository.save(positionsPerMovement + 1 + i, 100, angles, movementOf(i)), repeat),
+    }
+
+def main():
+    argumentParser = argparse.ArgumentParser(description="SQLite layout benchmark")
+    argumentParser.add_argument('--movements', type=int, default=50)
+    argumentParser.add_argument('--positions', type=int, default=200, help="Positions per movement")
+    argumentParser.add_argument('--repeat', type=int, default=200)
+    args = argumentParser.parse_args()
+
+    results = {}
+    with tempfile.TemporaryDirectory() as directory:
+        for name, factory, repositoryClass in (("legacy", LegacyDatabase, LegacyPositionRepository), ("migrated", Database, PositionRepository)):
+            db = factory(os.path.join(directory, f"{name}.db"))
+            repository = repositoryClass(db)
+            populate(db, repository, args.movements, args.positions)
+            rowBytes = db.conn.execute('SELECT AVG(length(angles)) FROM positions').fetchone()[0]
+            results[name] = runBenchmark(repository, args.movements, args.positions, args.repeat)
+            results[name]["angles bytes/row"] = rowBytes
+            db.conn.close()
+
+    print(f"{args.movements * args.positions} posiciones, {args.repeat} repeticiones (ms por operación)")
+    print(f"{'operación':<22}{'legacy':>10}{'migrated':>10}{'speedup':>10}")
+    for operation, legacyTime in results["legacy"].items():
+        migratedTime = results["migrated"][operation]
+        print(f"{operation:<22}{legacyTime:>10.3f}{migratedTime:>10.3f}{legacyTime / migratedTime:>9.1f}x")
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,74 @@
+import os
+import random
+import sys
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+from mjpeg_parser import MjpegFrameParser, SOI, EOI
+from tools.fake_camera import syntheticFrames
+
+# Comprobación del separador de frames MJPEG: el mismo flujo troceado de todas las formas
+# posibles (marcadores SOI/EOI partidos entre dos lecturas incluidos) debe dar los mismos frames.
+#   python tools/check_mjpeg_parser.py
+
+JUNK = b'\x00\x11\xff\x22'  # Bytes entre frames, con un 0xFF suelto que no es marcador
+
+def feedChunks(chunks, maxFrameSize=None):
+    parser = MjpegFrameParser(maxFrameSize) if maxFrameSize else MjpegFrameParser()
+    frames = []
+    for chunk in chunks:
+        frames += parser.feed(chunk)
+    return frames, parser
+
+def splitAt(stream, cuts):
+    edges = [0] + sorted(cuts) + [len(stream)]
+    return [stream[a:b] for a, b in zip(edges, edges[1:])]
+
+def checkEverySplitPoint(frames):
+    stream = JUNK + JUNK.join(frames) + JUNK
+    for cut in range(1, len(stream)):
+        result, _ = feedChunks(splitAt(stream, [cut]))
+        assert result == frames, f"split at byte {cut}"
+
+def checkSplitMarkers(frames):
+    # Corte justo entre FF y D8 / FF y D9 de cada frame
+    stream = b''.join(frames)
+    cuts = []
+    offset = 0
+    for frame in frames:
+        cuts += [offset + 1, offset + len(frame) - 1]
+        offset += len(frame)
+    result, _ = feedChunks(splitAt(stream, cuts))
+    assert result == frames, "split SOI/EOI markers"
+
+def checkByteByByte(frames):
+    stream = JUNK.join(frames)
+    result, _ = feedChunks(stream[index:index + 1] for index in range(len(stream)))
+    assert result == frames, "byte-by-byte feed"
+
+def checkRandomChunks(frames, rounds=200):
+    randomGenerator = random.Random(1)
+    stream = JUNK + JUNK.join(frames)
+    for _ in range(rounds):
+        cuts = randomGenerator.sample(range(1, len(stream)), randomGenerator.randint(1, 40))
+        result, _ = feedChunks(splitAt(stream, cuts))
+        assert result == frames, f"random cuts {sorted(cuts)}"
+
+def checkOversizedFrame(frames):
+    # Un frame sin EOI mayor que el límite se descarta y el siguiente se recupera entero
+    broken = SOI + bytes(range(1, 200))
+    result, parser = feedChunks([broken[:50], broken[50:], frames[0][:10], frames[0][10:]], maxFrameSize=100)
+    assert result == [frames[0]], "recovery after oversized frame"
+    assert parser.discardedBytes >= len(broken), "discarded bytes"
+
+def main():
+    smallFrames = syntheticFrames(count=3, size=40)
+    assert all(frame.startswith(SOI) and frame.endswith(EOI) for frame in smallFrames)
+    checkEverySplitPoint(smallFrames)
+    checkSplitMarkers(smallFrames)
+    checkByteByByte(smallFrames)
+    checkRandomChunks(syntheticFrames(count=5, size=3000))
+    checkOversizedFrame(smallFrames)
+    print("MjpegFrameParser OK")
+
+if __name__ == '__main__':
+    main()
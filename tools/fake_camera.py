@@ -0,0 +1,54 @@
+import argparse
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+from mjpeg_parser import MjpegFrameParser
+
+# Cámara falsa: escribe por stdout un flujo MJPEG enlatado al ritmo indicado,
+# como lo haría `libcamera-vid --codec mjpeg -o -`
+
+def syntheticFrames(count=30, size=20000):
+    frames = []
+    for index in range(count):
+        # Sin bytes 0xFF en el cuerpo, igual que los datos comprimidos reales
+        body = bytes((index + offset) % 0xFF for offset in range(size))
+        frames.append(b'\xff\xd8' + body + b'\xff\xd9')
+    return frames
+
+def loadFrames(path):
+    parser = MjpegFrameParser()
+    with open(path, 'rb') as mjpegFile:
+        return parser.feed(mjpegFile.read())
+
+def main():
+    argumentParser = argparse.ArgumentParser(description="Fake MJPEG camera")
+    argumentParser.add_argument('file', nargs='?', help="MJPEG file to replay in a loop")
+    argumentParser.add_argument('--framerate', type=float, default=20)
+    argumentParser.add_argument('--chunk', type=int, default=4096, help="Write size in bytes")
+    args, _ = argumentParser.parse_known_args()
+
+    frames = loadFrames(args.file) if args.file else syntheticFrames()
+    if not frames:
+        sys.exit("No JPEG frames found")
+
+    output = sys.stdout.buffer
+    period = 1 / args.framerate
+    nextFrame = time.monotonic()
+    index = 0
+    try:
+        while True:
+            frame = frames[index % len(frames)]
+            # Escrituras en trozos para que los frames lleguen partidos como en una tubería real
+            for offset in range(0, len(frame), args.chunk):
+                output.write(frame[offset:offset + args.chunk])
+            output.flush()
+            index += 1
+            nextFrame += period
+            time.sleep(max(0, nextFrame - time.monotonic()))
+    except (BrokenPipeError, KeyboardInterrupt):
+        pass
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,73 @@
+import argparse
+import json
+import os
+import sys
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+from database import Database
+from library_stream import iterateLibrary, LibraryImporter, LibraryFormatError, CONFLICT_POLICIES, PAGE_SIZE
+
+# Exporta o importa la biblioteca de movimientos en NDJSON, registro a registro:
+#   python tools/library.py export biblioteca.ndjson
+#   python tools/library.py import biblioteca.ndjson --on-conflict rename
+# "-" como fichero usa stdout/stdin.
+# Escribe directamente en SQLite: el servidor debe estar detenido durante una importación, porque su
+# caché de repositorios no vería los cambios. Con el servidor en marcha se usa /app/library/import.
+
+def exportLibrary(db, outputFile):
+    count = 0
+    for record in iterateLibrary(db):
+        outputFile.write(json.dumps(record, separators=(',', ':')) + "\n")
+        count += 1
+    return count
+
+def importLibrary(db, inputFile, onConflict):
+    importer = LibraryImporter(db, onConflict)
+    records = []
+    for lineNumber, line in enumerate(inputFile, 1):
+        if not line.strip():
+            continue
+        try:
+            records.append(json.loads(line))
+        except ValueError:
+            raise LibraryFormatError(f"Line {lineNumber}: invalid JSON")
+        if len(records) >= PAGE_SIZE:
+            importer.importRecords(records)
+            records.clear()
+    importer.importRecords(records)
+    return importer.getSummary()
+
+def main():
+    argumentParser = argparse.ArgumentParser(description="Movement library import/export",
+                                             epilog="Stop the server before importing: its repository cache does not see direct database writes. "
+                                                    "Use /app/library/import to import into a running server.")
+    argumentParser.add_argument('command', choices=('export', 'import'))
+    argumentParser.add_argument('file', help="NDJSON file, or - for stdout/stdin")
+    argumentParser.add_argument('--db', default='robot.db')
+    argumentParser.add_argument('--on-conflict', choices=CONFLICT_POLICIES, default='skip', help="What to do with movements whose name already exists")
+    args = argumentParser.parse_args()
+
+    db = Database(args.db)
+    try:
+        if args.command == 'export':
+            if args.file == '-':
+                count = exportLibrary(db, sys.stdout)
+            else:
+                with open(args.file, 'w') as outputFile:
+                    count = exportLibrary(db, outputFile)
+            print(f"{count} registros exportados", file=sys.stderr)
+        else:
+            if args.file == '-':
+                summary = importLibrary(db, sys.stdin, args.on_conflict)
+            else:
+                with open(args.file) as inputFile:
+                    summary = importLibrary(db, inputFile, args.on_conflict)
+            print("Importación completada:", summary, file=sys.stderr)
+    except LibraryFormatError as e:
+        print("Importación abortada:", e, file=sys.stderr)
+        sys.exit(1)
+    finally:
+        db.conn.close()
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,89 @@
+import argparse
+import configparser
+import json
+import os
+import random
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+from database import Database
+from interpolation import PROFILES
+from metrics import registry
+from models import NUM_SERVOS, packAngles
+from motion_engine import MotionEngine, MotionJob
+from servo_motor import ServoMotor
+from services.servo_manager import ServoManager
+from tick_scheduler import loadControlConfig
+from trajectory_cache import TrajectoryCache
+
+# Reproduce movimientos sintéticos con MotionEngine sobre el backend simulado y muestra la
+# regularidad de las escrituras, sin hardware (p. ej. en CI):
+#   python tools/motion_jitter.py --movements 5 --max-jitter-ms 2
+
+def simulatedConfig(configFile):
+    # Copia de la configuración con el backend simulado forzado
+    config = configparser.ConfigParser()
+    config.read(configFile)
+    if 'ServoMotor' not in config:
+        config['ServoMotor'] = {}
+    config['ServoMotor']['backend'] = 'simulated'
+    configCopy = tempfile.NamedTemporaryFile('w', suffix='.ini', delete=False)
+    with configCopy:
+        config.write(configCopy)
+    return configCopy.name
+
+def syntheticKeyframes(count, randomGenerator):
+    # Ángulos distintos en cada keyframe: todos los ticks escriben al menos un canal
+    keyframes = []
+    for index in range(count):
+        angles = [{"id": servoId, "angle": randomGenerator.randint(0, 180)} for servoId in range(1, NUM_SERVOS + 1)]
+        keyframes.append((randomGenerator.randint(200, 800), randomGenerator.choice(PROFILES), packAngles(angles)))
+    return keyframes
+
+def main():
+    argumentParser = argparse.ArgumentParser(description="Motion engine timing on the simulated servo backend")
+    argumentParser.add_argument('--config', default='config.ini')
+    argumentParser.add_argument('--movements', type=int, default=5)
+    argumentParser.add_argument('--keyframes', type=int, default=8)
+    argumentParser.add_argument('--seed', type=int, default=1)
+    argumentParser.add_argument('--max-jitter-ms', type=float, help="Exit with status 1 if the write interval jitter exceeds this")
+    args = argumentParser.parse_args()
+
+    period, overrun = loadControlConfig(args.config)
+    configFile = simulatedConfig(args.config)
+    servoMotor = ServoMotor(configFile)
+    engine = MotionEngine(servoMotor, ServoManager(configFile), period, overrun)
+    trajectoryCache = TrajectoryCache(Database(':memory:'), period)
+    randomGenerator = random.Random(args.seed)
+
+    engine.start()
+    try:
+        for movementId in range(1, args.movements + 1):
+            trajectory = trajectoryCache.compile(movementId, syntheticKeyframes(args.keyframes, randomGenerator))
+            engine.submit(MotionJob(movementId, trajectory))
+        while engine.isMoving():
+            time.sleep(0.05)
+    finally:
+        engine.stop()
+        servoMotor.close()
+        os.remove(configFile)
+
+    stats = servoMotor.backend.getStats()
+    snapshot = registry.snapshot()
+    report = {
+        "period_ms": period * 1000,
+        "backend": stats,
+        "tick_lateness": snapshot["histograms"].get("motion.tick_lateness"),
+        "movement_timing_error": snapshot["histograms"].get("motion.movement_timing_error"),
+        "missed_deadlines": snapshot["counters"].get("motion.missed_deadlines", 0),
+    }
+    print(json.dumps(report, indent=2))
+
+    if args.max_jitter_ms is not None and stats.get("interval_jitter_ms", 0.0) > args.max_jitter_ms:
+        print(f"Jitter {stats['interval_jitter_ms']:.3f} ms > {args.max_jitter_ms} ms", file=sys.stderr)
+        sys.exit(1)
+
+if __name__ == '__main__':
+    main()
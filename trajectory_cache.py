@@ -0,0 +1,116 @@
+from collections import OrderedDict
+import threading
+from dataclasses import dataclass, field
+import numpy as np
+from interpolation import interpolateSegment, interpolateFrame, interpolateHermite, splineSlopes, SPLINE
+from repositories.position_repository import PositionRepository
+from models import NUM_SERVOS, ANGLE_UNSET
+from metrics import registry
+
+ANGLE_SCALE = 100  # Ángulos almacenados en centésimas de grado
+UNSET = 0xFFFF  # Servo aún no definido por ningún keyframe: no se escribe
+
+@dataclass
+class Ramp:
+    # Rampas que parten del ángulo que tengan los servos al iniciar la reproducción (desconocido al compilar)
+    servoIndices: np.ndarray
+    targets: np.ndarray
+    startTick: int
+    ticks: int
+    profile: str
+
+@dataclass
+class CompiledTrajectory:
+    movementId: int
+    period: float
+    frames: np.ndarray  # (ticks, servos) uint16
+    ramps: list = field(default_factory=list)
+
+    @property
+    def numTicks(self):
+        return self.frames.shape[0]
+
+    def frameAt(self, tick, initialAngles):
+        # Frame en grados (NaN = servo que no se toca) y rampas activas resueltas vectorialmente
+        values = self.frames[tick]
+        frame = np.where(values == UNSET, np.nan, values / ANGLE_SCALE)
+        for ramp in self.ramps:
+            if ramp.startTick <= tick < ramp.startTick + ramp.ticks:
+                start = initialAngles[ramp.servoIndices]
+                start = np.where(np.isnan(start), ramp.targets, start)
+                t = (tick - ramp.startTick + 1) / ramp.ticks
+                frame[ramp.servoIndices] = interpolateFrame(start, ramp.targets, t, ramp.profile)
+        return frame
+
+class TrajectoryCache:
+    def __init__(self, db, period, maxEntries=32):
+        self.repository = PositionRepository(db)
+        self.period = period
+        self.maxEntries = maxEntries
+        self.entries = OrderedDict()
+        self.lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        registry.gauge('motion.trajectory_cache', self.getStats)
+
+    def get(self, movementId, version=0):
+        # Se llama desde el hilo de DatabaseWorker; invalidate() desde el bucle de eventos.
+        # Una entrada compilada para otra versión del movimiento (RepositoryCache) ya no sirve.
+        with self.lock:
+            entry = self.entries.get(movementId)
+            if entry is not None and entry[0] == version:
+                self.entries.move_to_end(movementId)
+                self.hits += 1
+                return entry[1]
+
+        self.misses += 1
+        keyframes = self.repository.findKeyframesByMovementId(movementId)  # ya ordenados por order
+        trajectory = self.compile(movementId, keyframes)
+        with self.lock:
+            self.entries[movementId] = (version, trajectory)
+            self.entries.move_to_end(movementId)
+            if len(self.entries) > self.maxEntries:
+                self.entries.popitem(last=False)
+        return trajectory
+
+    def invalidate(self, movementId):
+        with self.lock:
+            self.entries.pop(movementId, None)
+
+    def getStats(self):
+        return {"entries": len(self.entries), "hits": self.hits, "misses": self.misses}
+
+    def compile(self, movementId, keyframes):
+        # keyframes: [(time, profile, frame empaquetado), ...]
+        segmentTicks = [max(1, round(time / 1000.0 / self.period)) for time, _, _ in keyframes]
+        frames = np.full((sum(segmentTicks), NUM_SERVOS), UNSET, dtype=np.uint16)
+        ramps = []
+
+        # Ángulos en cada keyframe (un servo no definido mantiene el anterior); fila 0 = punto de partida
+        targets = [np.full(NUM_SERVOS, np.nan)]
+        for _, _, packedFrame in keyframes:
+            angles = np.frombuffer(packedFrame, dtype=np.uint8)
+            targets.append(np.where(angles == ANGLE_UNSET, targets[-1], angles))
+        # Los keyframes spline consecutivos forman una sola curva: se mira toda la secuencia de antemano
+        slopes = splineSlopes(targets, segmentTicks, [profile == SPLINE for _, profile, _ in keyframes])
+        tick = 0
+
+        for index, ((_, profile, _), ticks) in enumerate(zip(keyframes, segmentTicks)):
+            current, target = targets[index], targets[index + 1]
+
+            # Interpolación de todo el segmento de una sola vez con el perfil del keyframe
+            known = ~np.isnan(current)
+            if profile == SPLINE:
+                segment = interpolateHermite(current[known], target[known], slopes[index][known], slopes[index + 1][known], ticks)
+            else:
+                segment = interpolateSegment(current[known], target[known], ticks, profile)
+            frames[tick:tick + ticks, known] = np.rint(segment * ANGLE_SCALE)
+
+            newServos = np.flatnonzero(~known & ~np.isnan(target))
+            if newServos.size:
+                frames[tick:tick + ticks, newServos] = np.rint(target[newServos] * ANGLE_SCALE)
+                ramps.append(Ramp(newServos, target[newServos], tick, ticks, profile))
+
+            tick += ticks
+
+        return CompiledTrajectory(movementId, self.period, frames, ramps)
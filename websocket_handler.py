@@ -1,128 +1,142 @@
-import json
+from response_handler import ResponseHandler, BatchCollector
+from services.servo_manager import LIVE_PAIRS, LIVE_FRAME
+from wire_codec import getSession, createCodec, unpackPayloadAngles
+from router import Router
+from metrics import registry
 
-class WebSocketHandler:
-    def __init__(self, buttonManager, servoManager, movementService, positionService, videoControl):
+BATCH_EXCLUDED_ENDPOINTS = {"/app/positions/moveToInitial", "/app/positions/executeMovement", "/app/motion/play"}
+
+# Mensajes de error para rutas desconocidas de cada recurso
+INVALID_REQUEST_MESSAGES = {
+    "/app/buttons": 'Invalid button request',
+    "/app/servos": 'Invalid servo request',
+    "/app/movements": 'Invalid movement request',
+    "/app/positions": 'Invalid position request',
+    "/app/video": 'Invalid video request',
+    "/app/session": 'Invalid session request',
+    "/app/library": 'Invalid library request',
+    "/app/motion": 'Invalid motion request',
+}
+
+class BatchAborted(Exception):
+    pass
+
+class WebSocketHandler(ResponseHandler):
+    def __init__(self, dbWorker, buttonManager, servoManager, movementService, positionService, videoControl, libraryService, motionScheduler):
+        self.dbWorker = dbWorker
         self.buttonManager = buttonManager
         self.servoManager = servoManager
         self.movementService = movementService
         self.positionService = positionService
         self.videoControl = videoControl
+        self.libraryService = libraryService
+        self.motionScheduler = motionScheduler
+
+        # Tabla (endpoint, método) -> handler; cada servicio registra sus propias rutas
+        self.router = Router()
+        for service in (buttonManager, servoManager, movementService, positionService, videoControl, libraryService, motionScheduler):
+            service.registerRoutes(self.router)
+        self.router.register("/app/session/encoding", "POST", self.negotiateEncoding)
+        self.router.register("/app/batch", "POST", self.handleBatchRequest)
+        self.router.register("/app/metrics", "GET", self.getMetrics)
+        self.router.register("/app/metrics/routes", "GET", self.getRouteStats)
 
     async def handleMessage(self, websocket, path):
+        session = getSession(websocket)
         async for message in websocket:
+            # Los mensajes binarios que empiezan por un tipo de frame en vivo son del canal de control de servos;
+            # ningún mapa MessagePack/CBOR empieza por esos bytes
+            if isinstance(message, bytes) and message[:1] in (bytes([LIVE_PAIRS]), bytes([LIVE_FRAME])):
+                self.servoManager.stageLiveFrame(message)
+                continue
+
             try:
-                data = json.loads(message)
-            except json.JSONDecodeError:
-                print('Error al decodificar el mensaje JSON')
-                await self.sendErrorResponse(websocket, 'Invalid JSON', None)
+                data = session.codec.decode(message)
+            except Exception:
+                print('Error al decodificar el mensaje', session.codec.name)
+                await self.sendErrorResponse(websocket, 'Invalid JSON' if session.codec.name == 'json' else 'Invalid message', None)
+                continue
+
+            if not isinstance(data, dict):
+                await self.sendErrorResponse(websocket, 'Invalid request', None)
                 continue
-            
+
             endpoint = data.get('endpoint')
             method = data.get('method')
-            payload = data.get('payload', {})
+            payload = unpackPayloadAngles(data.get('payload', {}))
             requestId = data.get('request_id')
 
-            if not endpoint or not method:
+            if not endpoint or not method or not isinstance(endpoint, str) or not isinstance(method, str):
                 await self.sendErrorResponse(websocket, 'Invalid request', requestId)
                 continue
 
-            # Rutas para Button
-            if endpoint.startswith("/app/buttons"):
-                await self.handleButtonRequests(endpoint, method, payload, websocket, requestId)
-            # Rutas para Servo
-            elif endpoint.startswith("/app/servos"):
-                await self.handleServoRequests(endpoint, method, payload, websocket, requestId)
-            # Rutas para Movements
-            elif endpoint.startswith("/app/movements"):
-                await self.handleMovementRequests(endpoint, method, payload, websocket, requestId)
-            # Rutas para Positions
-            elif endpoint.startswith("/app/positions"):
-                await self.handlePositionRequests(endpoint, method, payload, websocket, requestId)
-            # Rutas para Video Control
-            elif endpoint.startswith("/app/video"):
-                await self.handleVideoRequests(endpoint, method, websocket, requestId)
-            else:
-                await self.sendErrorResponse(websocket, 'Invalid endpoint', requestId)
-
-    async def handleButtonRequests(self, endpoint, method, payload, websocket, requestId):
-        if endpoint == "/app/buttons/create" and method == "POST":
-            await self.buttonManager.createButton(payload, websocket, requestId)
-        elif endpoint == "/app/buttons/update" and method == "POST":
-            await self.buttonManager.updateButtonById(payload, websocket, requestId)
-        elif endpoint == "/app/buttons/delete" and method == "POST":
-            await self.buttonManager.deleteButton(websocket, requestId)
-        elif endpoint == "/app/buttons/get" and method == "GET":
-            await self.buttonManager.getButtonById(payload.get('id'), websocket, requestId)
-        elif endpoint == "/app/buttons/getAll" and method == "GET":
-            await self.buttonManager.getAllButtons(websocket, requestId)
-        else:
-            await self.sendErrorResponse(websocket, 'Invalid button request', requestId)
-
-    async def handleServoRequests(self, endpoint, method, payload, websocket, requestId):
-        if endpoint == "/app/servos/create" and method == "POST":
-            await self.servoManager.createServo(payload, websocket, requestId)
-        elif endpoint == "/app/servos/update" and method == "POST":
-            await self.servoManager.updateServoById(payload, websocket, requestId)
-        elif endpoint == "/app/servos/delete" and method == "POST":
-            await self.servoManager.deleteServo(websocket, requestId)
-        elif endpoint == "/app/servos/get" and method == "GET":
-            await self.servoManager.getServoById(payload.get('id'), websocket, requestId)
-        elif endpoint == "/app/servos/getAll" and method == "GET":
-            await self.servoManager.getAllServos(websocket, requestId)
-        elif endpoint == "/app/servos/savePosition" and method == "POST":
-            await self.servoManager.savePosition(websocket, requestId)
-        else:
-            await self.sendErrorResponse(websocket, 'Invalid servo request', requestId)
-
-    async def handleMovementRequests(self, endpoint, method, payload, websocket, requestId):
-        if endpoint == "/app/movements/create" and method == "POST":
-            await self.movementService.createMovement(payload, websocket, requestId)
-        elif endpoint == "/app/movements/update" and method == "POST":
-            await self.movementService.updateMovementById(payload, websocket, requestId)
-        elif endpoint == "/app/movements/delete" and method == "POST":
-            await self.movementService.deleteMovementById(payload.get('id'), websocket, requestId)
-        elif endpoint == "/app/movements/get" and method == "GET":
-            await self.movementService.getMovementById(payload.get('id'), websocket, requestId)
-        elif endpoint == "/app/movements/getAll" and method == "GET":
-            await self.movementService.getAllMovements(websocket, requestId)
-        else:
-            await self.sendErrorResponse(websocket, 'Invalid movement request', requestId)
-
-    async def handlePositionRequests(self, endpoint, method, payload, websocket, requestId):
-        if endpoint == "/app/positions/create" and method == "POST":
-            await self.positionService.createPosition(payload, websocket, requestId)
-        elif endpoint == "/app/positions/update" and method == "POST":
-            await self.positionService.updatePositionById(payload, websocket, requestId)
-        elif endpoint == "/app/positions/delete" and method == "POST":
-            await self.positionService.deletePositionById(payload.get('id'), websocket, requestId)
-        elif endpoint == "/app/positions/get" and method == "GET":
-            await self.positionService.getPositionById(payload.get('id'), websocket, requestId)
-        elif endpoint == "/app/positions/getAll" and method == "GET":
-            await self.positionService.getAllPositions(websocket, requestId)
-        elif endpoint == "/app/positions/getByMovementId" and method == "GET":
-            await self.positionService.getPositionsByMovementId(payload.get('movement_id'), websocket, requestId)
-        elif endpoint == "/app/positions/moveUp" and method == "POST":
-            await self.positionService.movePositionUp(payload.get('id'), websocket, requestId)
-        elif endpoint == "/app/positions/moveDown" and method == "POST":
-            await self.positionService.movePositionDown(payload.get('id'), websocket, requestId)
-        elif endpoint == "/app/positions/moveToInitial" and method == "POST":
-            await self.positionService.moveToInitialPosition(websocket, requestId)
-        elif endpoint == "/app/positions/executeMovement" and method == "POST":
-            await self.positionService.executeMovement(payload.get('movement_id'), websocket, requestId)
-        else:
-            await self.sendErrorResponse(websocket, 'Invalid position request', requestId)
-
-    async def handleVideoRequests(self, endpoint, method, websocket, requestId):
-        if endpoint == "/app/video/start" and method == "POST":
-            await self.videoControl.startVideoStream()
-        elif endpoint == "/app/video/stop" and method == "POST":
-            self.videoControl.stopVideoStream()
-        else:
-            await self.sendErrorResponse(websocket, 'Invalid video request', requestId)
-
-    async def sendErrorResponse(self, websocket, errorMessage, requestId):
-        response = {
-            'request_id': requestId,
-            'error': errorMessage
-        }
-        await websocket.send(json.dumps(response))
+            await self.dispatch(endpoint, method, payload, websocket, requestId)
+
+    async def dispatch(self, endpoint, method, payload, websocket, requestId):
+        if await self.router.dispatch(endpoint, method, payload, websocket, requestId):
+            return
+        for prefix, errorMessage in INVALID_REQUEST_MESSAGES.items():
+            if endpoint.startswith(prefix):
+                await self.sendErrorResponse(websocket, errorMessage, requestId)
+                return
+        await self.sendErrorResponse(websocket, 'Invalid endpoint', requestId)
+
+    async def handleBatchRequest(self, payload, websocket, requestId):
+        requests = payload.get('requests')
+        if not isinstance(requests, list) or not requests:
+            await self.sendErrorResponse(websocket, {"message": "requests must be a non-empty list"}, requestId)
+            return
+
+        # Una sub-petición mal formada fallaría dentro de la transacción y cerraría la conexión
+        for request in requests:
+            if (not isinstance(request, dict) or not self.isBatchable(request.get('endpoint'))
+                    or not request.get('method') or not isinstance(request['method'], str)
+                    or not isinstance(request.get('payload', {}), dict)):
+                await self.sendErrorResponse(websocket, {"message": "Invalid batch request", "request": request}, requestId)
+                return
+
+        # Todo o nada: la primera sub-petición con error deshace la transacción completa
+        collector = BatchCollector(getSession(websocket))
+        try:
+            async with self.dbWorker.transaction():
+                for request in requests:
+                    subPayload = unpackPayloadAngles(request.get('payload', {}))
+                    await self.dispatch(request['endpoint'], request['method'], subPayload, collector, request.get('request_id'))
+                    if collector.failed:
+                        raise BatchAborted()
+        except BatchAborted:
+            pass
+
+        await self.sendResponse(websocket, {"committed": not collector.failed, "results": collector.results}, requestId)
+
+    def isBatchable(self, endpoint):
+        # Solo operaciones de datos; las que mueven el robot no se pueden deshacer
+        if not isinstance(endpoint, str) or endpoint in BATCH_EXCLUDED_ENDPOINTS:
+            return False
+        return endpoint.startswith("/app/movements/") or endpoint.startswith("/app/positions/")
+
+    async def negotiateEncoding(self, payload, websocket, requestId):
+        session = getSession(websocket)
+        encoding = payload.get('encoding', session.codec.name)
+        packedAngles = payload.get('packed_angles', session.packedAngles)
+        if not isinstance(packedAngles, bool):
+            await self.sendErrorResponse(websocket, {"message": "packed_angles must be a boolean"}, requestId)
+            return
+        try:
+            codec = createCodec(encoding)
+        except (ValueError, ImportError):
+            await self.sendErrorResponse(websocket, {"message": f"Unsupported encoding: {encoding}"}, requestId)
+            return
+
+        # La confirmación viaja todavía con la codificación anterior
+        await self.sendResponse(websocket, {"encoding": codec.name, "packed_angles": packedAngles}, requestId)
+        session.codec = codec
+        session.packedAngles = packedAngles
+
+    async def getRouteStats(self, payload, websocket, requestId):
+        await self.sendResponse(websocket, self.router.getStats(), requestId)
+
+    async def getMetrics(self, payload, websocket, requestId):
+        metrics = registry.snapshot()
+        metrics["routes"] = self.router.getStats()
+        await self.sendResponse(websocket, metrics, requestId)
@@ -0,0 +1,98 @@
+import json
+import weakref
+from models import packAngles, unpackAngles, ANGLE_UNSET
+
+class JsonCodec:
+    name = 'json'
+    binary = False
+
+    def encode(self, message):
+        return json.dumps(message)
+
+    def decode(self, message):
+        return json.loads(message)
+
+    def encodeAngleFrame(self, frame):
+        return [None if angle == ANGLE_UNSET else angle for angle in frame]
+
+class MsgpackCodec:
+    name = 'msgpack'
+    binary = True
+
+    def __init__(self):
+        import msgpack  # Dependencia opcional, solo si un cliente negocia MessagePack
+        self.msgpack = msgpack
+
+    def encode(self, message):
+        return self.msgpack.packb(message, use_bin_type=True)
+
+    def decode(self, message):
+        return self.msgpack.unpackb(message, raw=False)
+
+    def encodeAngleFrame(self, frame):
+        return frame
+
+class CborCodec:
+    name = 'cbor'
+    binary = True
+
+    def __init__(self):
+        import cbor2  # Dependencia opcional, solo si un cliente negocia CBOR
+        self.cbor2 = cbor2
+
+    def encode(self, message):
+        return self.cbor2.dumps(message)
+
+    def decode(self, message):
+        return self.cbor2.loads(message)
+
+    def encodeAngleFrame(self, frame):
+        return frame
+
+CODECS = {codec.name: codec for codec in (JsonCodec, MsgpackCodec, CborCodec)}
+JSON_CODEC = JsonCodec()
+
+class Session:
+    def __init__(self):
+        self.codec = JSON_CODEC
+        self.packedAngles = False
+
+# Estado de codificación por conexión; desaparece al cerrarse el websocket
+sessions = weakref.WeakKeyDictionary()
+
+def getSession(websocket):
+    try:
+        session = sessions.get(websocket)
+    except TypeError:  # Objetos sin soporte de weakref: siempre JSON
+        return Session()
+    if session is None:
+        session = Session()
+        sessions[websocket] = session
+    return session
+
+def createCodec(name):
+    if not isinstance(name, str) or name not in CODECS:
+        raise ValueError(f"Unsupported encoding: {name}")
+    return CODECS[name]()
+
+def packPayload(payload, codec):
+    # Sustituye listas de ángulos [{"id", "angle"}, ...] por su forma empaquetada
+    if not isinstance(payload, dict):
+        return payload
+    if isinstance(payload.get('angles'), list):
+        frame = packAngles(payload['angles'])
+        if frame is not None:
+            payload = dict(payload, angles=codec.encodeAngleFrame(frame))
+    if isinstance(payload.get('content'), list):
+        payload = dict(payload, content=[packPayload(item, codec) for item in payload['content']])
+    return payload
+
+def unpackPayloadAngles(payload):
+    # Acepta ángulos empaquetados (bytes o lista indexada por id) en las peticiones
+    if isinstance(payload, dict):
+        angles = payload.get('angles')
+        if isinstance(angles, (bytes, bytearray)) or (isinstance(angles, list) and angles and not isinstance(angles[0], dict)):
+            unpacked = unpackAngles(angles)
+            if unpacked is not None:
+                payload = dict(payload, angles=unpacked)
+    return payload